@@ -0,0 +1,208 @@
+#@ File (label="Folder for the synthetic slides and outputs", style="directory") work_folder
+#@ String (label="Sizes of the squared ROIs", value="2, 4, 8") tile_sizes
+#@ String (label="Square ROIs per side of the ROI", value="2, 4") tiles_per_side
+#@ String (label="Number of channels", value="1, 3") channel_counts
+#@ String (label="Parallel workers for saving", value="1, 4") worker_counts
+#@ String (label="For ARA: piram, ch, res (empty for none)", value="2, 1, 25") registration
+#@ Integer (label="Repetitions", value=3) repeats
+
+# Hernando M. Vergara
+# benchmark_split.py times what czi_roisplitter.py does, select -> cubify -> save,
+# including the image for registration, on synthetic slides (synthetic_slides.py)
+# for every combination of square ROI size, number of square ROIs, number of
+# channels and number of workers. The results are printed and saved in
+# benchmark_results.json in the work folder, with tiles/s and MB/s.
+# Run it from Fiji, or headless:
+# ImageJ --ij2 --headless --run benchmarks/benchmark_split.py 'work_folder="/tmp/bench"'
+
+# This runs inside Fiji (Jython)
+
+import json
+import os
+import shutil
+import sys
+import time
+from os import makedirs, path
+
+sys.path.append(path.dirname(path.abspath(__file__)))
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from ij import IJ
+from ij.gui import Roi
+from synthetic_slides import write_synthetic_slide
+
+from czi_roisplitter.metadata_cache import get_cache_path
+from czi_roisplitter.planning import get_output_path, get_square_side
+from czi_roisplitter.roi_splitter import RoiSplitter
+
+
+def get_slide(work_folder, n_channels):
+    # slides are reused between runs, they only depend on the number of channels
+    raw_folder = path.join(
+        work_folder, "{}-channels".format(n_channels), "Raw_data"
+    )
+    slide_path = path.join(raw_folder, "synthetic.ome.tif")
+    if not path.isfile(slide_path):
+        if not path.isdir(raw_folder):
+            makedirs(raw_folder)
+        print("Writing synthetic slide with {} channels".format(n_channels))
+        write_synthetic_slide(slide_path, n_channels=n_channels)
+    return slide_path
+
+
+def get_stage(report, name):
+    for stage in report.to_dict()["stages"]:
+        if stage["name"] == name:
+            return stage
+    return {
+        "seconds": 0.0,
+        "bytes_read": 0,
+        "bytes_written": 0,
+        "peak_memory": None,
+    }
+
+
+def run_scenario(
+    slide_path, tile_size, n_side, n_workers, registration_info, run_name
+):
+    # the outputs are deleted before every run, so nothing is skipped as already saved,
+    # and so is the cache of the structure of the slide, so that it is always parsed
+    file_core_name = run_name + "_synthetic"
+    animal_folder = path.dirname(get_output_path(slide_path, file_core_name))
+    if path.isdir(animal_folder):
+        shutil.rmtree(animal_folder)
+    if path.isfile(get_cache_path(slide_path)):
+        os.remove(get_cache_path(slide_path))
+    start = time.time()
+    splitter = RoiSplitter()
+    splitter.select_input(slide_path, file_core_name)
+    makedirs(path.join(animal_folder, "Registration"))
+    lr_dapi = splitter.open_slice(splitter.possible_slices[0], prefetch=False)
+    select_seconds = time.time() - start
+    # a square in the middle of the slice, of n_side square ROIs per side
+    side = n_side * get_square_side(tile_size, splitter.binFactor)
+    if side > min(lr_dapi.getWidth(), lr_dapi.getHeight()):
+        splitter.close_slice()
+        return None
+    lr_dapi.setRoi(
+        Roi(
+            (lr_dapi.getWidth() - side) / 2,
+            (lr_dapi.getHeight() - side) / 2,
+            side,
+            side,
+        )
+    )
+    start = time.time()
+    n_tiles = len(splitter.cubify_ROI(tile_size, "benchmark"))
+    cubify_seconds = time.time() - start
+    report = splitter.report
+    start = time.time()
+    splitter.save_ROIs(registration_info, n_workers=n_workers)
+    save_seconds = time.time() - start
+    splitter.close_slice()
+
+    export = get_stage(report, "tiles export")
+    # bytes of the square ROIs alone, the image for registration is read and written apart
+    tiles = report.to_dict()["tiles"]
+    read = sum(tile["bytes_read"] for tile in tiles)
+    written = sum(tile["bytes_written"] for tile in tiles)
+    seconds = export["seconds"]
+    return {
+        "n_tiles": n_tiles,
+        "select_seconds": select_seconds,
+        "metadata_parse_seconds": get_stage(report, "metadata parse")[
+            "seconds"
+        ],
+        "cubify_seconds": cubify_seconds,
+        "save_seconds": save_seconds,
+        "total_seconds": select_seconds + cubify_seconds + save_seconds,
+        "export_seconds": seconds,
+        "tiles_per_second": n_tiles / seconds if seconds else None,
+        "MB_read_per_second": read / 1e6 / seconds if seconds else None,
+        "MB_written_per_second": written / 1e6 / seconds if seconds else None,
+        "export_peak_memory": export["peak_memory"],
+        "registration_seconds": get_stage(report, "registration downsampling")[
+            "seconds"
+        ],
+        "summary_seconds": get_stage(report, "summary")["seconds"],
+    }
+
+
+def parse_list(text):
+    return [int(v) for v in text.split(",") if v.strip() != ""]
+
+
+def run_benchmarks(
+    work_folder,
+    tile_sizes,
+    tiles_per_side,
+    channel_counts,
+    worker_counts,
+    registration_info,
+    repeats,
+):
+    results = {
+        "fiji_version": IJ.getFullVersion(),
+        "registration_info": registration_info,
+        "runs": [],
+    }
+    for n_channels in channel_counts:
+        slide_path = get_slide(work_folder, n_channels)
+        for tile_size in tile_sizes:
+            for n_side in tiles_per_side:
+                for n_workers in worker_counts:
+                    for repeat in range(repeats):
+                        run_name = "bench-c{}-t{}-n{}-w{}-r{}".format(
+                            n_channels, tile_size, n_side, n_workers, repeat
+                        )
+                        result = run_scenario(
+                            slide_path,
+                            tile_size,
+                            n_side,
+                            n_workers,
+                            registration_info,
+                            run_name,
+                        )
+                        if result is None:
+                            print(
+                                run_name
+                                + " does not fit in the slide, skipped"
+                            )
+                            continue
+                        result.update(
+                            {
+                                "n_channels": n_channels,
+                                "tile_size": tile_size,
+                                "tiles_per_side": n_side,
+                                "n_workers": n_workers,
+                                "repeat": repeat,
+                            }
+                        )
+                        results["runs"].append(result)
+                        print(
+                            "{}: {} tiles, {:.1f} s in total, {:.1f} tiles/s, "
+                            "{:.1f} MB/s read, {:.1f} MB/s written".format(
+                                run_name,
+                                result["n_tiles"],
+                                result["total_seconds"],
+                                result["tiles_per_second"] or 0,
+                                result["MB_read_per_second"] or 0,
+                                result["MB_written_per_second"] or 0,
+                            )
+                        )
+    with open(
+        path.join(work_folder, "benchmark_results.json"), "w"
+    ) as results_file:
+        json.dump(results, results_file, indent=1)
+    return results
+
+
+if __name__ in ["__builtin__", "__main__"]:
+    run_benchmarks(
+        work_folder.getAbsolutePath(),
+        parse_list(tile_sizes),
+        parse_list(tiles_per_side),
+        parse_list(channel_counts),
+        parse_list(worker_counts),
+        registration,
+        repeats,
+    )
@@ -0,0 +1,84 @@
+# Hernando M. Vergara
+# synthetic_slides.py writes OME-TIFF files that look, to Bio-Formats, like
+# the .czi files of the Slide Scanner: every slice is a series at full
+# resolution followed by its piramid (one series per level, each binned by
+# bin_step), all channels at every level, and every series has the pixel
+# size of the high resolution. The pixels are random, with a fixed seed,
+# so that the same parameters always give the same file.
+
+# This runs inside Fiji (Jython)
+
+from jarray import zeros
+from java.util import Random
+from loci.formats import MetadataTools
+from loci.formats.out import OMETiffWriter
+from ome.units import UNITS
+from ome.units.quantity import Length
+
+# size of the blocks in which the file is written
+WRITE_TILE = 512
+
+
+def get_series_sizes(width, height, n_slices, n_piramids, bin_step):
+    sizes = []
+    for _ in range(n_slices):
+        for p in range(n_piramids):
+            sizes.append(
+                (
+                    max(1, width // bin_step**p),
+                    max(1, height // bin_step**p),
+                )
+            )
+    return sizes
+
+
+def write_synthetic_slide(
+    file_path,
+    width=8192,
+    height=6144,
+    n_slices=1,
+    n_channels=3,
+    n_piramids=5,
+    bin_step=2,
+    pixel_size=0.345,
+    seed=0,
+):
+    sizes = get_series_sizes(width, height, n_slices, n_piramids, bin_step)
+    meta = MetadataTools.createOMEXMLMetadata()
+    for s, (w, h) in enumerate(sizes):
+        MetadataTools.populateMetadata(
+            meta,
+            s,
+            "series-" + str(s),
+            False,
+            "XYCZT",
+            "uint16",
+            w,
+            h,
+            1,
+            n_channels,
+            1,
+            1,
+        )
+        meta.setPixelsPhysicalSizeX(Length(pixel_size, UNITS.MICROMETER), s)
+        meta.setPixelsPhysicalSizeY(Length(pixel_size, UNITS.MICROMETER), s)
+
+    writer = OMETiffWriter()
+    writer.setMetadataRetrieve(meta)
+    writer.setBigTiff(True)
+    writer.setId(file_path)
+    random = Random(seed)
+    for s, (w, h) in enumerate(sizes):
+        writer.setSeries(s)
+        tile_w = writer.setTileSizeX(min(WRITE_TILE, w))
+        tile_h = writer.setTileSizeY(min(WRITE_TILE, h))
+        for c in range(n_channels):
+            for y in range(0, h, tile_h):
+                for x in range(0, w, tile_w):
+                    block_w = min(tile_w, w - x)
+                    block_h = min(tile_h, h - y)
+                    block = zeros(block_w * block_h * 2, "b")
+                    random.nextBytes(block)
+                    writer.saveBytes(c, block, x, y, block_w, block_h)
+    writer.close()
+    return sizes
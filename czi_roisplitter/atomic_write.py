@@ -0,0 +1,25 @@
+# Hernando M. Vergara
+# atomic_write.py puts a new version of a file in place of the old one. The
+# new version is written to a temporary file next to it first, and then
+# renamed over it, so that readers (e.g. other workers of cohort_runner.py)
+# find either the old file or the new one, never half of it.
+
+# This is plain python, it runs both in Fiji (Jython) and in CPython
+
+from __future__ import absolute_import
+
+import os
+from os import path
+
+
+def replace_file(tmp_path, file_path):
+    # renaming over a file replaces it in a single step on POSIX. On Windows
+    # the rename fails while the file exists, so there it is removed first,
+    # and for a moment there is no file
+    try:
+        os.rename(tmp_path, file_path)
+    except OSError:
+        if not path.exists(file_path):
+            raise
+        os.remove(file_path)
+        os.rename(tmp_path, file_path)
@@ -0,0 +1,113 @@
+#@ String (label="CZI files, separated by commas") files
+#@ String (label="ARA regions, e.g. Both-Caudoputamen, Left-Amygdala", value="Both-Caudoputamen") region
+#@ Integer (label="Size of the squared ROIs", value=6) tile_size
+#@ Float (label="Minimum fraction of each square inside the ROI", value=0) min_coverage
+#@ String (label="For ARA: piram, ch, res (empty for none)", value="") registration
+#@ Integer (label="Parallel workers for saving", value=1) workers
+#@ String (label="Output format", choices={"tif", "ome-tiff"}, value="tif") output_format
+#@ String (label="Skip squares: min focus, max saturated, min tissue (empty for none)", value="") quality
+#@ Boolean (label="Contact sheet of every slide", value=false) contact_sheet
+
+# Hernando M. Vergara
+# batch_split.py runs, without GUI, what czi_roisplitter.py does for every
+# slice of every .czi file: load the ARA regions, cubify them and save the ROIs.
+# The regions of a slice are saved in a single read of its high resolution image.
+# It can be run headless, e.g.:
+# ImageJ --ij2 --headless --run batch_split.py \
+#   'files="/data/raw/a.czi,/data/raw/b.czi",region="Both-Caudoputamen",tile_size=6,min_coverage=0.5,registration="",workers=4,output_format="tif",quality="",contact_sheet=false'
+
+# This runs inside Fiji (Jython)
+
+from __future__ import absolute_import
+
+import sys
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from java.lang import Throwable
+
+from czi_roisplitter.planning import parse_ARA_regions
+from czi_roisplitter.roi_splitter import RoiSplitter
+
+
+def process_file(
+    input_path,
+    ARA_regions,
+    tile_size,
+    registration_info="",
+    n_workers=1,
+    min_coverage=0,
+    output_format="tif",
+    quality_thresholds="",
+    contact_sheet=False,
+):
+    splitter = RoiSplitter()
+    splitter.select_input(input_path)
+    failed_slices = []
+    for name in splitter.possible_slices:
+        try:
+            # the slices are processed one after the other, there is no
+            # user working on one while the next ones are read
+            splitter.open_slice(name, prefetch=False)
+            splitter.load_ARA_regions(ARA_regions)
+            splitter.cubify_ROI(tile_size, min_coverage=min_coverage)
+            splitter.save_ROIs(
+                registration_info,
+                n_workers=n_workers,
+                output_format=output_format,
+                quality_thresholds=quality_thresholds,
+                contact_sheet=contact_sheet,
+            )
+        except (Exception, Throwable) as err:
+            # a slice without registration should not stop the others
+            print("Could not process {}: {}".format(name, err))
+            failed_slices.append(name)
+        finally:
+            splitter.close_slice()
+    return failed_slices
+
+
+def process_files(
+    input_paths,
+    ARA_regions,
+    tile_size,
+    registration_info="",
+    n_workers=1,
+    min_coverage=0,
+    output_format="tif",
+    quality_thresholds="",
+    contact_sheet=False,
+):
+    failed_slices = []
+    for input_path in input_paths:
+        print("Processing file " + input_path)
+        failed_slices += process_file(
+            input_path,
+            ARA_regions,
+            tile_size,
+            registration_info,
+            n_workers,
+            min_coverage,
+            output_format,
+            quality_thresholds,
+            contact_sheet,
+        )
+    if failed_slices:
+        print("These slices could not be processed: " + str(failed_slices))
+    else:
+        print("All slices processed")
+    return failed_slices
+
+
+if __name__ in ["__builtin__", "__main__"]:
+    process_files(
+        [f.strip() for f in files.split(",")],
+        parse_ARA_regions(region),
+        tile_size,
+        registration,
+        workers,
+        min_coverage,
+        output_format,
+        quality,
+        contact_sheet,
+    )
@@ -0,0 +1,169 @@
+#@ String (label="Action", choices={"enqueue", "work", "status"}, value="work") action
+#@ File (label="Queue folder, on storage shared by the nodes", style="directory") queue_folder
+#@ String (label="CZI files, separated by commas (enqueue)", value="") files
+#@ String (label="ARA regions, e.g. Both-Caudoputamen, Left-Amygdala (enqueue)", value="Both-Caudoputamen") region
+#@ Integer (label="Size of the squared ROIs (enqueue)", value=6) tile_size
+#@ Float (label="Minimum fraction of each square inside the ROI (enqueue)", value=0) min_coverage
+#@ String (label="For ARA: piram, ch, res (empty for none) (enqueue)", value="") registration
+#@ Integer (label="Parallel workers for saving (enqueue)", value=1) workers
+#@ String (label="Output format (enqueue)", choices={"tif", "ome-tiff"}, value="tif") output_format
+#@ String (label="Skip squares: min focus, max saturated, min tissue (empty for none) (enqueue)", value="") quality
+#@ Boolean (label="Contact sheet of every slide (enqueue)", value=false) contact_sheet
+
+# Hernando M. Vergara
+# cohort_runner.py processes a whole cohort on several nodes at the same time.
+# 'enqueue' writes every (file, slice, ARA region) of the files in a queue
+# (see work_queue.py) in a folder on shared storage, with the settings to use.
+# 'work' processes units of the queue until there are none left: start it,
+# headless, on as many nodes as wanted. Units of workers that die are given to
+# others, and units that fail are tried again, up to 3 times.
+# 'status' prints how many units are pending, claimed, done and failed.
+# e.g.:
+# ImageJ --ij2 --headless --run cohort_runner.py \
+#   'action="enqueue",queue_folder="/shared/queue",files="/data/raw/a.czi,/data/raw/b.czi",region="Both-Caudoputamen",tile_size=6,min_coverage=0.5,registration="",workers=4,output_format="tif",quality="",contact_sheet=false'
+# ImageJ --ij2 --headless --run cohort_runner.py 'action="work",queue_folder="/shared/queue"'
+
+# This runs inside Fiji (Jython)
+
+from __future__ import absolute_import
+
+import socket
+import sys
+from os import getpid, path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from java.lang import Throwable
+
+from czi_roisplitter.planning import get_slice_names, parse_ARA_regions
+from czi_roisplitter.roi_splitter import RoiSplitter, load_file_structure
+from czi_roisplitter.work_queue import WorkQueue
+
+
+def get_worker_id():
+    return "{}-{}".format(socket.gethostname(), getpid())
+
+
+def enqueue(queue_folder, input_paths, ARA_regions, config):
+    # returns the number of units added to the queue
+    queue = WorkQueue(queue_folder)
+    queue.create(config)
+    units = []
+    for input_path in input_paths:
+        # only the names of the slices are needed, the output folders are
+        # made by the workers
+        structure = load_file_structure(input_path)
+        file_core_name = path.basename(input_path).split(".czi")[0]
+        slice_names = get_slice_names(
+            file_core_name, structure["number_of_images"]
+        )
+        for name in slice_names:
+            for ARA_region in ARA_regions:
+                units.append(
+                    {
+                        "input_path": input_path,
+                        "slice": name,
+                        "region": ARA_region,
+                    }
+                )
+    added = queue.add_units(units)
+    print(
+        "{} units added to the queue, {} were already there".format(
+            added, len(units) - added
+        )
+    )
+    return added
+
+
+def process_unit(splitter, unit, config):
+    try:
+        splitter.open_slice(unit["slice"], prefetch=False)
+        splitter.load_ARA_regions([unit["region"]])
+        splitter.cubify_ROI(
+            config["tile_size"], min_coverage=config["min_coverage"]
+        )
+        # the image for registration is saved by the first unit of the slice
+        splitter.save_ROIs(
+            config["registration"],
+            n_workers=config["workers"],
+            output_format=config["output_format"],
+            quality_thresholds=config["quality"],
+            contact_sheet=config.get("contact_sheet", False),
+        )
+    finally:
+        splitter.close_slice()
+
+
+def work(queue_folder, worker_id=None):
+    # returns the number of units processed by this worker
+    if worker_id is None:
+        worker_id = get_worker_id()
+    queue = WorkQueue(queue_folder)
+    config = queue.read_config()
+    # the structure of a file is read once for all its units
+    splitter = None
+    processed = 0
+    while True:
+        queue.requeue_stale()
+        entry = queue.claim(worker_id)
+        if entry is None:
+            break
+        unit = entry["unit"]
+        print(
+            "{} processing {} of {} ({})".format(
+                worker_id, unit["slice"], unit["input_path"], unit["region"]
+            )
+        )
+        with queue.keep_alive(entry):
+            try:
+                if (
+                    splitter is None
+                    or splitter.input_path != unit["input_path"]
+                ):
+                    splitter = RoiSplitter()
+                    splitter.select_input(unit["input_path"])
+                process_unit(splitter, unit, config)
+                queue.complete(entry)
+                processed += 1
+            except (Exception, Throwable) as err:
+                # a unit that fails should not stop the others
+                print("Could not process {}: {}".format(unit["slice"], err))
+                queue.fail(entry, err)
+    print(
+        "No units left in the queue, {} processed by {}".format(
+            processed, worker_id
+        )
+    )
+    return processed
+
+
+def print_status(queue_folder):
+    status = WorkQueue(queue_folder).status()
+    print(
+        ", ".join(
+            "{} {}".format(status[state], state)
+            for state in ["pending", "claimed", "done", "failed"]
+        )
+    )
+    return status
+
+
+if __name__ in ["__builtin__", "__main__"]:
+    queue_folder = queue_folder.getPath()
+    if action == "enqueue":
+        enqueue(
+            queue_folder,
+            [f.strip() for f in files.split(",")],
+            parse_ARA_regions(region),
+            {
+                "tile_size": tile_size,
+                "min_coverage": min_coverage,
+                "registration": registration,
+                "workers": workers,
+                "output_format": output_format,
+                "quality": quality,
+                "contact_sheet": contact_sheet,
+            },
+        )
+    elif action == "work":
+        work(queue_folder)
+    print_status(queue_folder)
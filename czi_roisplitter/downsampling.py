@@ -0,0 +1,82 @@
+# Hernando M. Vergara
+# downsampling.py reads one channel of a series in horizontal strips and
+# averages each of them down to the final size, so that only a strip of the
+# big image is in memory at any time, whatever the size of the slice.
+
+# downsample_channel runs inside Fiji (Jython). The sizes and the strips are
+# plain python, so they can be tested without Fiji.
+
+from __future__ import absolute_import
+
+import math
+
+# maximum number of pixels of the series read at once
+STRIP_PIXELS = 16 * 1024 * 1024
+
+
+def get_downsampled_size(width, height, rescale_factor):
+    # same size as ImageProcessor.resize(new_width)
+    new_width = int(rescale_factor * width)
+    new_height = int(new_width * (float(height) / width))
+    if new_width < 1 or new_height < 1:
+        raise ValueError(
+            "Downsampling {}x{} pixels by {} leaves no pixels, the "
+            "final resolution is too coarse for this piramid".format(
+                width, height, rescale_factor
+            )
+        )
+    return new_width, new_height
+
+
+def get_downsampling_strips(height, new_height, max_rows):
+    """
+    Splits the rows of an image of height pixels, that is downsampled to
+    new_height, in strips of at most max_rows (approximately) input rows.
+    Returns a list of (y0, y1, new_y0, new_y1): input rows y0 to y1 are
+    downsampled to output rows new_y0 to new_y1
+    """
+    if new_height < 1:
+        raise ValueError(
+            "Cannot downsample {} rows to {}".format(height, new_height)
+        )
+    rows_per_output_row = float(height) / new_height
+    output_rows_per_strip = max(1, int(max_rows / rows_per_output_row))
+    strips = []
+    for new_y0 in range(0, new_height, output_rows_per_strip):
+        new_y1 = min(new_y0 + output_rows_per_strip, new_height)
+        y0 = int(new_y0 * rows_per_output_row)
+        y1 = min(height, int(math.ceil(new_y1 * rows_per_output_row)))
+        strips.append((y0, y1, new_y0, new_y1))
+    return strips
+
+
+def downsample_channel(
+    input_path, series_num, channel, rescale_factor, title="", report=None
+):
+    """
+    Returns an ImagePlus of the channel (starting at 1) of the series,
+    resized by area averaging by rescale_factor, keeping the aspect ratio
+    """
+    from ij import ImagePlus
+
+    from czi_roisplitter.tile_reader import TileReader
+
+    with TileReader(input_path, series_num, report) as tile_reader:
+        width = tile_reader.size_x
+        height = tile_reader.size_y
+        new_width, new_height = get_downsampled_size(
+            width, height, rescale_factor
+        )
+        output = None
+        max_rows = max(1, STRIP_PIXELS // width)
+        for y0, y1, new_y0, new_y1 in get_downsampling_strips(
+            height, new_height, max_rows
+        ):
+            strip = tile_reader.read_processor(
+                channel, [0, y0, width, y1 - y0]
+            )
+            small_strip = strip.resize(new_width, new_y1 - new_y0, True)
+            if output is None:
+                output = small_strip.createProcessor(new_width, new_height)
+            output.insert(small_strip, 0, new_y0)
+    return ImagePlus(title, output)
@@ -0,0 +1,151 @@
+# Hernando M. Vergara
+# file_lock.py is a lock for files that several processes, possibly on
+# different computers, write on shared storage (e.g. the index of the
+# positions of an animal, or the image for registration of a slice).
+# The lock is a folder next to the file, as creating a folder is atomic
+# also on network file systems. The folder keeps the name of its owner, so
+# that only the owner releases it, and is touched regularly while held.
+# A lock not touched for stale_after seconds was left by a process that
+# died, and is broken.
+
+# This is plain python, it runs both in Fiji (Jython) and in CPython
+
+from __future__ import absolute_import
+
+import errno
+import os
+import socket
+import threading
+import time
+import uuid
+from os import path
+
+LOCK_SUFFIX = ".lock"
+OWNER_FILE_NAME = "owner"
+
+
+def get_owner_token():
+    return "{}-{}-{}".format(
+        socket.gethostname(), os.getpid(), uuid.uuid4().hex
+    )
+
+
+def read_owner(lock_path):
+    # None if there is no lock, or its owner has not been written yet
+    try:
+        with open(path.join(lock_path, OWNER_FILE_NAME), "r") as owner_file:
+            return owner_file.read()
+    except (IOError, OSError):
+        return None
+
+
+def remove_lock_folder(lock_path):
+    owner_path = path.join(lock_path, OWNER_FILE_NAME)
+    if path.exists(owner_path):
+        os.remove(owner_path)
+    os.rmdir(lock_path)
+
+
+class FileLock(object):
+    """
+    Use it as a context manager:
+        with FileLock(file_path):
+            ... read and write file_path ...
+    """
+
+    def __init__(self, file_path, timeout=600, stale_after=600, poll=0.1):
+        self.lock_path = file_path + LOCK_SUFFIX
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.poll = poll
+        self.token = get_owner_token()
+        self._stop_refresh = None
+
+    def acquire(self):
+        start = time.time()
+        while True:
+            try:
+                os.mkdir(self.lock_path)
+                break
+            except OSError as err:
+                # e.g. the folder is not writable
+                if err.errno != errno.EEXIST:
+                    raise
+            self._break_if_stale()
+            if time.time() - start > self.timeout:
+                raise RuntimeError(
+                    "Timed out waiting for the lock " + self.lock_path
+                )
+            time.sleep(self.poll)
+        with open(
+            path.join(self.lock_path, OWNER_FILE_NAME), "w"
+        ) as owner_file:
+            owner_file.write(self.token)
+        self._start_refresh()
+
+    def _start_refresh(self):
+        # touches the lock while it is held, so that long critical sections
+        # (e.g. downsampling a whole channel) are not taken as abandoned
+        stop = threading.Event()
+        self._stop_refresh = stop
+
+        def refresh():
+            while not stop.is_set():
+                stop.wait(self.stale_after / 4.0)
+                if not stop.is_set():
+                    try:
+                        os.utime(self.lock_path, None)
+                    except OSError:
+                        return
+
+        thread = threading.Thread(target=refresh)
+        thread.daemon = True
+        thread.start()
+
+    def _break_if_stale(self):
+        try:
+            if time.time() - path.getmtime(self.lock_path) <= self.stale_after:
+                return
+        except OSError:
+            # released meanwhile
+            return
+        owner = read_owner(self.lock_path)
+        # moved away first, as only one of the waiters can do it
+        broken_path = self.lock_path + "." + uuid.uuid4().hex + ".stale"
+        try:
+            os.rename(self.lock_path, broken_path)
+        except OSError:
+            # broken (or released) by someone else meanwhile
+            return
+        if read_owner(broken_path) != owner:
+            # a new lock was taken just before the rename, give it back
+            try:
+                os.rename(broken_path, self.lock_path)
+            except OSError:
+                print("Could not give back the lock " + self.lock_path)
+            return
+        print("Breaking the abandoned lock " + self.lock_path)
+        try:
+            remove_lock_folder(broken_path)
+        except OSError:
+            pass
+
+    def release(self):
+        if self._stop_refresh is not None:
+            self._stop_refresh.set()
+            self._stop_refresh = None
+        # only the owner releases the lock, never a lock taken by another
+        # process
+        if read_owner(self.lock_path) != self.token:
+            print(
+                "The lock " + self.lock_path + " was taken by another process"
+            )
+            return
+        remove_lock_folder(self.lock_path)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -0,0 +1,115 @@
+# Hernando M. Vergara
+# focus_preview.py reads the image used to check the focus of the square rois
+# in a background thread, so that the GUI does not freeze while reading it.
+# It is read in horizontal strips of every channel, showing the progress in
+# the ImageJ bar, and it can be cancelled between strips (also with Esc).
+
+# This runs inside Fiji (Jython)
+
+from __future__ import absolute_import
+
+import threading
+
+from ij import IJ, CompositeImage, ImagePlus, ImageStack
+from ij.plugin import ContrastEnhancer
+from ij.process import LUT
+from java.awt import Color
+from java.lang import Throwable
+
+from czi_roisplitter.tile_reader import TileReader
+
+# maximum number of pixels read at once
+FOCUS_STRIP_PIXELS = 4 * 1024 * 1024
+# colors of the channels, in order
+CHANNEL_COLORS = [Color.white, Color.green, Color.red, Color.cyan]
+
+
+class FocusPreview(object):
+    """
+    Reads the rect [x, y, w, h] of every channel of a series of the piramid.
+    calibration is (pixel_size, units) of that series.
+    """
+
+    def __init__(self, input_path, series_num, rect, calibration, title=""):
+        self.input_path = input_path
+        self.series_num = series_num
+        self.rect = rect
+        self.calibration = calibration
+        self.title = title
+        self.cancelled = threading.Event()
+        self.thread = None
+
+    def start(self, on_loaded):
+        # on_loaded is called with the image, from the background thread
+        self.thread = threading.Thread(target=self._run, args=(on_loaded,))
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def is_cancelled(self):
+        return self.cancelled.isSet() or IJ.escapePressed()
+
+    def _run(self, on_loaded):
+        try:
+            imp = self.read()
+        except (Exception, Throwable) as err:
+            print("Could not open the focus image: {}".format(err))
+            imp = None
+        finally:
+            IJ.showProgress(1.0)
+        if imp is None:
+            return
+        # cancelled (e.g. the slice was cubified again) after the last strip
+        # was read
+        if self.is_cancelled():
+            imp.close()
+            imp.flush()
+            return
+        on_loaded(imp)
+
+    def read(self):
+        # returns the image with the channels colored and stretched,
+        # or None if cancelled
+        IJ.resetEscape()
+        with TileReader(self.input_path, self.series_num) as tile_reader:
+            x, y, w, h = tile_reader.clip_rect(self.rect)
+            rows = max(1, FOCUS_STRIP_PIXELS // w)
+            n_strips = (h + rows - 1) // rows
+            total = n_strips * tile_reader.n_channels
+            stack = ImageStack(w, h)
+            for c in range(1, tile_reader.n_channels + 1):
+                channel = None
+                for strip_num, y0 in enumerate(range(y, y + h, rows)):
+                    if self.is_cancelled():
+                        IJ.showStatus("Focus image cancelled")
+                        return None
+                    strip = tile_reader.read_processor(
+                        c, [x, y0, w, min(rows, y + h - y0)]
+                    )
+                    if channel is None:
+                        channel = strip.createProcessor(w, h)
+                    channel.insert(strip, 0, y0 - y)
+                    IJ.showProgress((c - 1) * n_strips + strip_num + 1, total)
+                stack.addSlice(channel)
+        imp = ImagePlus(self.title, stack)
+        cal = imp.getCalibration()
+        cal.pixelWidth = self.calibration[0]
+        cal.pixelHeight = self.calibration[0]
+        cal.setUnit(self.calibration[1])
+        n_channels = stack.getSize()
+        if n_channels > 1:
+            imp.setDimensions(n_channels, 1, 1)
+            imp = CompositeImage(imp, IJ.COMPOSITE)
+        for c in range(n_channels):
+            imp.setC(c + 1)
+            if n_channels > 1:
+                imp.setChannelLut(
+                    LUT.createLutFromColor(
+                        CHANNEL_COLORS[c % len(CHANNEL_COLORS)]
+                    )
+                )
+            ContrastEnhancer().stretchHistogram(imp, 0.35)
+        imp.setC(1)
+        return imp
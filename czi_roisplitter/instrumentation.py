@@ -0,0 +1,146 @@
+# Hernando M. Vergara
+# instrumentation.py records where the time goes when splitting ROIs:
+# wall time, bytes read and written, and peak memory of every stage
+# (metadata parse, series open, channel extraction, contrast stretch,
+# tiff write, summary...) and of every square ROI, and saves it as json.
+# Stages can be timed from several threads at the same time.
+
+# This is plain python, it runs both in Fiji (Jython) and in CPython.
+# The memory of the JVM is only measured in Fiji.
+
+from __future__ import absolute_import
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class JvmHeapProbe(object):
+    """Peak use of the heap of the JVM"""
+
+    def __init__(self):
+        from java.lang.management import ManagementFactory, MemoryType
+
+        self.pools = [
+            pool
+            for pool in ManagementFactory.getMemoryPoolMXBeans()
+            if pool.getType() == MemoryType.HEAP
+        ]
+
+    def reset(self):
+        for pool in self.pools:
+            pool.resetPeakUsage()
+
+    def peak(self):
+        return sum(pool.getPeakUsage().getUsed() for pool in self.pools)
+
+
+class StageRecord(object):
+    def __init__(self):
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def add_read(self, n_bytes):
+        self.bytes_read += n_bytes
+
+    def add_written(self, n_bytes):
+        self.bytes_written += n_bytes
+
+
+class RunReport(object):
+    """
+    Accumulates the stages and square ROIs of a run.
+    memory_probe has reset() and peak() methods, e.g. JvmHeapProbe
+    """
+
+    def __init__(self, memory_probe=None):
+        self.memory_probe = memory_probe
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        # name -> {'calls', 'seconds', 'bytes_read', 'bytes_written',
+        # 'peak_memory'}
+        self.stages = {}
+        self.stage_order = []
+        self.tiles = []
+        self.info = {}
+
+    @contextmanager
+    def stage(self, name, reset_memory=False):
+        # reset_memory measures the peak memory of this stage alone,
+        # it should not be used for stages that run in parallel.
+        # Other stages have no peak memory, as it would be the one of
+        # whatever ran since the last reset
+        if reset_memory and self.memory_probe is not None:
+            self.memory_probe.reset()
+        record = StageRecord()
+        start = time.time()
+        try:
+            yield record
+        finally:
+            seconds = time.time() - start
+            peak_memory = None
+            if reset_memory and self.memory_probe is not None:
+                peak_memory = self.memory_probe.peak()
+            with self.lock:
+                if name not in self.stages:
+                    self.stage_order.append(name)
+                    self.stages[name] = {
+                        "calls": 0,
+                        "seconds": 0.0,
+                        "bytes_read": 0,
+                        "bytes_written": 0,
+                        "peak_memory": None,
+                    }
+                stage = self.stages[name]
+                stage["calls"] += 1
+                stage["seconds"] += seconds
+                stage["bytes_read"] += record.bytes_read
+                stage["bytes_written"] += record.bytes_written
+                if peak_memory is not None:
+                    stage["peak_memory"] = max(
+                        stage["peak_memory"] or 0, peak_memory
+                    )
+
+    def add_tile(self, roi_name, seconds, bytes_read, bytes_written):
+        with self.lock:
+            self.tiles.append(
+                {
+                    "roi_name": roi_name,
+                    "seconds": seconds,
+                    "bytes_read": bytes_read,
+                    "bytes_written": bytes_written,
+                }
+            )
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "info": dict(self.info),
+                "wall_time": time.time() - self.start_time,
+                "stages": [
+                    dict(self.stages[name], name=name)
+                    for name in self.stage_order
+                ],
+                "tiles": list(self.tiles),
+            }
+
+    def save(self, file_path):
+        with open(file_path, "w") as report_file:
+            json.dump(self.to_dict(), report_file, indent=1)
+
+    def summary(self):
+        # one line per stage, to print
+        lines = []
+        for stage in self.to_dict()["stages"]:
+            lines.append(
+                "{}: {:.2f} s, {} calls, {:.1f} MB read, {:.1f} MB "
+                "written".format(
+                    stage["name"],
+                    stage["seconds"],
+                    stage["calls"],
+                    stage["bytes_read"] / 1e6,
+                    stage["bytes_written"] / 1e6,
+                )
+            )
+        return "\n".join(lines)
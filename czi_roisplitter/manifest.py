@@ -0,0 +1,95 @@
+# Hernando M. Vergara
+# manifest.py keeps a record of the square ROIs (tiles) of a manual ROI that
+# have been saved, so that if the saving stops halfway, running it again
+# only saves the missing ones.
+# Every saved tile appends a line to the manifest (json lines), which is
+# flushed to disk straight away. If the program dies while writing a line,
+# that incomplete line is ignored when reading it back.
+
+# This is plain python, it runs both in Fiji (Jython) and in CPython
+
+from __future__ import absolute_import
+
+import json
+import os
+import threading
+from os import path
+
+MANIFEST_SUFFIX = "_manifest.jsonl"
+
+
+def get_manifest_path(roi_output_path, manualROI_name):
+    return path.join(roi_output_path, manualROI_name + MANIFEST_SUFFIX)
+
+
+class TileManifest(object):
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self.lock = threading.Lock()
+        # roi_name -> {'roi_name', 'rect', 'files', 'status'}
+        self.tiles = {}
+        # a line left unfinished needs to be ended before appending
+        self.needs_newline = False
+        if path.isfile(manifest_path):
+            self._read()
+
+    def _read(self):
+        with open(self.manifest_path, "r") as manifest_file:
+            content = manifest_file.read()
+        for line in content.splitlines():
+            try:
+                entry = json.loads(line)
+                self.tiles[entry["roi_name"]] = entry
+            except (ValueError, KeyError, TypeError):
+                # unfinished line
+                continue
+        self.needs_newline = content != "" and not content.endswith("\n")
+
+    def reset(self):
+        # forget every tile, for outputs that can not be resumed
+        with self.lock:
+            self.tiles = {}
+            self.needs_newline = False
+            if path.isfile(self.manifest_path):
+                os.remove(self.manifest_path)
+
+    def is_done(self, roi_name, rect):
+        # the tile was saved in the same position, and its files are intact
+        entry = self.tiles.get(roi_name)
+        if entry is None or entry["status"] != "done":
+            return False
+        # tiles inside a container can not be checked on their own
+        if not entry["files"]:
+            return False
+        if list(entry["rect"]) != [int(v) for v in rect]:
+            return False
+        for file_path, size in entry["files"].items():
+            if not path.isfile(file_path) or path.getsize(file_path) != size:
+                return False
+        return True
+
+    def get_pending(self, tiles):
+        # tiles is a list of (roi_name, rect)
+        return [
+            (roi_name, rect)
+            for roi_name, rect in tiles
+            if not self.is_done(roi_name, rect)
+        ]
+
+    def mark_done(self, roi_name, rect, file_paths):
+        entry = {
+            "roi_name": roi_name,
+            "rect": [int(v) for v in rect],
+            "files": dict((f, path.getsize(f)) for f in file_paths),
+            "status": "done",
+        }
+        line = json.dumps(entry, sort_keys=True) + "\n"
+        with self.lock:
+            with open(self.manifest_path, "a") as manifest_file:
+                if self.needs_newline:
+                    manifest_file.write("\n")
+                    self.needs_newline = False
+                manifest_file.write(line)
+                manifest_file.flush()
+                os.fsync(manifest_file.fileno())
+            self.tiles[roi_name] = entry
@@ -0,0 +1,82 @@
+# Hernando M. Vergara
+# metadata_cache.py stores the structure of a .czi file (number of images,
+# piramids, binning factors and bits per pixel) in a small json file next to
+# it, so that it does not need to be parsed again every time the file is
+# opened. The cache is only used if the path, size and modification time of the
+# .czi file are the same as when it was written.
+
+# This is plain python, it runs both in Fiji (Jython) and in CPython
+
+from __future__ import absolute_import
+
+import json
+import os
+from os import path
+
+from czi_roisplitter.atomic_write import replace_file
+from czi_roisplitter.file_lock import FileLock
+
+CACHE_VERSION = 2
+CACHE_SUFFIX = ".roisplitter.json"
+# seconds to wait for another process writing the cache, after that the cache
+# is not written, as if it was not there
+CACHE_LOCK_TIMEOUT = 5
+
+
+def get_cache_path(input_path):
+    return input_path + CACHE_SUFFIX
+
+
+def get_file_key(input_path):
+    stat = os.stat(input_path)
+    return {
+        "path": path.abspath(input_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+    }
+
+
+def load_cache(input_path):
+    """
+    Returns the cached information of the file,
+    or None if there is no cache or it is out of date
+    """
+    cache_path = get_cache_path(input_path)
+    if not path.isfile(cache_path):
+        return None
+    try:
+        with open(cache_path, "r") as cache_file:
+            cache = json.load(cache_file)
+    except (IOError, OSError, ValueError):
+        return None
+    if cache.get("version") != CACHE_VERSION:
+        return None
+    if cache.get("key") != get_file_key(input_path):
+        return None
+    return cache["data"]
+
+
+def _write_cache(cache_path, input_path, data):
+    tmp_path = cache_path + ".tmp"
+    cache = {
+        "version": CACHE_VERSION,
+        "key": get_file_key(input_path),
+        "data": data,
+    }
+    with open(tmp_path, "w") as cache_file:
+        json.dump(cache, cache_file, indent=1)
+    replace_file(tmp_path, cache_path)
+
+
+def save_cache(input_path, data):
+    cache_path = get_cache_path(input_path)
+    try:
+        # several processes might open the same file at the same time
+        with FileLock(cache_path, timeout=CACHE_LOCK_TIMEOUT):
+            _write_cache(cache_path, input_path, data)
+    except (IOError, OSError, RuntimeError):
+        # the folder of the raw data might not be writable, or another process
+        # holds the lock for too long. It is just a cache
+        print("Could not write cache file " + cache_path)
+        return False
+    return True
@@ -0,0 +1,275 @@
+# Hernando M. Vergara
+# planning.py has the geometry and the naming of the splitting: which
+# series to open, how the square rois of the low resolution image map to
+# the high resolution one, where and with which names everything is saved,
+# and the parsing of what the user writes in the GUI.
+# Nothing here reads images, so tiles can be planned (and tested) without Fiji.
+
+# This is plain python, it runs both in Fiji (Jython) and in CPython.
+
+from __future__ import absolute_import
+
+from os import path
+
+# get Xth lowest resolution binned, depending on the number
+# of resolutions. The order is higher to lower.
+# This number is hard-coded for now
+LOW_RES_TO_OPEN = 2
+# the size of the square rois is given in units of this
+GUI_ADJUST = 128  # for historic reasons
+# the ARA regions are taken from both hemispheres, or from one of them. The
+# slice is split in two at the middle of the image, the left hemisphere
+# being the left half of the image
+HEMISPHERES = ["Both", "Left", "Right"]
+
+
+# naming
+
+
+def get_slice_names(file_core_name, number_of_images):
+    return [
+        file_core_name + "_slice-" + str(n) for n in range(number_of_images)
+    ]
+
+
+def get_slice_number(slice_name):
+    return int(slice_name.split("-")[-1])
+
+
+def get_animal_id(file_core_name):
+    return file_core_name.split("_")[0]
+
+
+def get_output_path(input_path, file_core_name):
+    # the ROIs of every animal go to <experiment>/Processed_data/<animal>/ROIs,
+    # next to the folder of the raw data
+    return path.join(
+        path.dirname(path.dirname(input_path)),
+        "Processed_data",
+        get_animal_id(file_core_name),
+        "ROIs",
+    )
+
+
+def get_manualROI_name(slice_name, roi_name="", ARA_region=None):
+    # rois loaded from the ARA are named after the region
+    if ARA_region is None:
+        return slice_name + "_manualROI-" + roi_name
+    return slice_name + "_manualROI-" + ARA_region
+
+
+def get_square_roi_name(manualROI_name, roiID):
+    return manualROI_name + "_squareROI-" + str(roiID)
+
+
+def get_registration_folder_name(channel, final_resolution):
+    return (
+        "Slices_for_ARA_registration_channel-"
+        + str(channel)
+        + "_"
+        + str(final_resolution)
+        + "-umpx"
+    )
+
+
+# series and coordinates
+
+
+def get_lowres_series(high_res_index, num_of_piramids):
+    return high_res_index + num_of_piramids - LOW_RES_TO_OPEN
+
+
+def get_lowres_bin_factor(binFactor, binStep):
+    # binning of the low resolution image that is opened, from the one of
+    # the lowest resolution
+    return binFactor / (binStep ** (LOW_RES_TO_OPEN - 1))
+
+
+def get_square_side(tile_size, binFactor):
+    # tile_size is in units of GUI_ADJUST pixels in high resolution,
+    # the side is returned in pixels of the low resolution
+    return int(tile_size) * GUI_ADJUST / binFactor
+
+
+def plan_tiles(corners, L, binFactor, manualROI_name):
+    # translates the square rois of the low resolution to high resolution.
+    # Returns the tiles to read, (name, [x, y, w, h]),
+    # and the positions to save, [roiID, x, y, side]
+    tiles = []
+    positions = []
+    Lt = int(L * binFactor)
+    for roiID, (x, y) in enumerate(corners, 1):
+        xt = int(x * binFactor)
+        yt = int(y * binFactor)
+        positions.append([roiID, xt, yt, Lt])
+        tiles.append(
+            (get_square_roi_name(manualROI_name, roiID), [xt, yt, Lt, Lt])
+        )
+    return tiles, positions
+
+
+def get_focus_rect(corners, L, binFactor, binStep, pir_for_focus):
+    # bounding box of the square rois in the Xth highest resolution,
+    # as [x, y, w, h]
+    bf_corr = binFactor / (binStep ** (pir_for_focus - 1))
+    min_x = int(min([x[0] for x in corners]) * bf_corr)
+    min_y = int(min([x[1] for x in corners]) * bf_corr)
+    max_x = int((max([x[0] for x in corners]) + L) * bf_corr)
+    max_y = int((max([x[1] for x in corners]) + L) * bf_corr)
+    return [min_x, min_y, max_x - min_x, max_y - min_y]
+
+
+def choose_focus_piramid(high_res_size, num_of_piramids, binStep, target_size):
+    # coarsest piramid (1 is the highest resolution) in which an image of
+    # high_res_size pixels in the highest resolution has at least target_size
+    # pixels
+    piramid = 1
+    for p in range(2, num_of_piramids + 1):
+        if high_res_size / float(binStep ** (p - 1)) < target_size:
+            break
+        piramid = p
+    return piramid
+
+
+def get_registration_rescale(binStep, reg_pir_num, res_xy_size, reg_final_res):
+    # factor to get from the Xth resolution to Xum/px, so that it can be
+    # aligned to ARA
+    reg_im_bin_factor = binStep**reg_pir_num
+    regres_resolution = reg_im_bin_factor * res_xy_size
+    return regres_resolution / reg_final_res
+
+
+# parsing of the GUI
+
+
+def parse_registration_info(registration_info):
+    # 'piramid number, channel, final resolution', or empty for no
+    # registration. Returns None or (piramid number, channel, final resolution)
+    if registration_info.strip() == "":
+        return None
+    reg_text_info = registration_info.split(",")
+    return (
+        int(reg_text_info[0]),
+        int(reg_text_info[1]),
+        float(reg_text_info[2]),
+    )
+
+
+def parse_rois_to_remove(text):
+    # numbers separated by commas, a range (e.g. 3-7) or a single number.
+    # Raises ValueError if it cannot be interpreted
+    # separated numbers by commas
+    if "," in text:
+        return [int(i) for i in text.split(",")]
+    # a range
+    if "-" in text:
+        range_nums = [int(i) for i in text.split("-")]
+        return list(range(range_nums[0], range_nums[1] + 1))
+    # a single number
+    return [int(text)]
+
+
+def parse_ARA_regions(text):
+    # regions separated by commas, each of them as hemisphere-name,
+    # e.g. 'Both-Caudoputamen, Left-Amygdala'
+    return [
+        region.strip() for region in text.split(",") if region.strip() != ""
+    ]
+
+
+def get_region_name(ARA_region):
+    # the name of the region in the file of the registration
+    return ARA_region.split("-", 1)[1]
+
+
+def get_hemisphere(ARA_region):
+    # 'Both', 'Left' or 'Right'. Raises ValueError for anything else
+    hemisphere = ARA_region.split("-", 1)[0]
+    if "-" not in ARA_region or hemisphere not in HEMISPHERES:
+        raise ValueError(
+            "{} should be hemisphere-name, the hemisphere being one "
+            "of {}".format(ARA_region, ", ".join(HEMISPHERES))
+        )
+    return hemisphere
+
+
+def get_hemisphere_rect(hemisphere, width, height):
+    # [x, y, w, h] of the half of an image of width x height that has the
+    # hemisphere, None for both
+    if hemisphere == "Both":
+        return None
+    half = width // 2
+    if hemisphere == "Left":
+        return [0, 0, half, height]
+    return [half, 0, width - half, height]
+
+
+# reading the tiles of several regions at once
+
+
+def rects_overlap(a, b):
+    # tiles that only touch do not overlap
+    return (
+        a[0] < b[0] + b[2]
+        and b[0] < a[0] + a[2]
+        and a[1] < b[1] + b[3]
+        and b[1] < a[1] + a[3]
+    )
+
+
+def get_union_rect(a, b):
+    x = min(a[0], b[0])
+    y = min(a[1], b[1])
+    return [
+        x,
+        y,
+        max(a[0] + a[2], b[0] + b[2]) - x,
+        max(a[1] + a[3], b[1] + b[3]) - y,
+    ]
+
+
+def plan_shared_reads(region_tiles):
+    """
+    Groups the tiles of several regions that overlap, so that the pixels
+    they share are read only once.
+    region_tiles is a list, one per region, of lists of
+    (roi_name, [x, y, w, h]).
+    Returns the groups, as (rect to read, members), in the order to read them,
+    each member being (region number, tile number, roi_name, rect),
+    and the tiles of every region in the order in which they are read,
+    as tile numbers refer to that order.
+    """
+    groups = []
+    for region_num, tiles in enumerate(region_tiles):
+        for roi_name, rect in tiles:
+            area = rect[2] * rect[3]
+            for group in groups:
+                if not rects_overlap(group["rect"], rect):
+                    continue
+                # a tile joins a group only if reading their union once
+                # is not more than reading them separately
+                union = get_union_rect(group["rect"], rect)
+                if union[2] * union[3] <= group["area"] + area:
+                    group["rect"] = union
+                    group["area"] += area
+                    group["members"].append((region_num, roi_name, rect))
+                    break
+            else:
+                groups.append(
+                    {
+                        "rect": list(rect),
+                        "area": area,
+                        "members": [(region_num, roi_name, rect)],
+                    }
+                )
+    ordered_tiles = [[] for _ in region_tiles]
+    planned_groups = []
+    for group in groups:
+        members = []
+        for region_num, roi_name, rect in group["members"]:
+            members.append(
+                (region_num, len(ordered_tiles[region_num]), roi_name, rect)
+            )
+            ordered_tiles[region_num].append((roi_name, rect))
+        planned_groups.append((group["rect"], members))
+    return planned_groups, ordered_tiles
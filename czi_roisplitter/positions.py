@@ -0,0 +1,84 @@
+# Hernando M. Vergara
+# positions.py writes the positions of the square ROIs in the high
+# resolution image. For every manual ROI there is a _roi_positions.txt file,
+# and every animal has an index (csv) with the square ROIs of all its
+# manual ROIs, so that they can be loaded for a whole cohort at once.
+
+# This is plain python, it runs both in Fiji (Jython) and in CPython
+
+from __future__ import absolute_import
+
+import csv
+from os import path
+
+from czi_roisplitter.atomic_write import replace_file
+from czi_roisplitter.file_lock import FileLock
+
+POSITIONS_HEADER = [
+    "roiID",
+    "high_res_x_pos",
+    "high_res_y_pos",
+    "registration_image_pixel_size",
+    "high_res_pixel_size",
+    "units",
+]
+INDEX_FILE_NAME = "000_all_roi_positions.csv"
+INDEX_HEADER = [
+    "manualROI_name",
+    "roiID",
+    "high_res_x_pos",
+    "high_res_y_pos",
+    "size",
+    "registration_image_pixel_size",
+    "high_res_pixel_size",
+    "units",
+]
+
+
+def write_positions_file(file_path, positions):
+    """
+    positions is a list of rows as in POSITIONS_HEADER.
+    The file is written at once, with the format of the _roi_positions.txt
+    """
+    lines = [
+        ", ".join(str(v) for v in row)
+        for row in [POSITIONS_HEADER] + list(positions)
+    ]
+    with open(file_path, "w") as positions_file:
+        positions_file.write("\n".join(lines))
+
+
+def get_index_path(roi_output_path):
+    return path.join(roi_output_path, INDEX_FILE_NAME)
+
+
+def read_positions_index(index_path):
+    # returns a list of dictionaries, one per square ROI
+    if not path.isfile(index_path):
+        return []
+    with open(index_path, "r") as index_file:
+        return list(csv.DictReader(index_file))
+
+
+def update_positions_index(index_path, manualROI_name, rows):
+    """
+    Replaces the square ROIs of manualROI_name in the index with rows,
+    which are lists of the values of INDEX_HEADER without manualROI_name
+    """
+    # other processes (e.g. the workers of cohort_runner.py) might update
+    # the index of the same animal at the same time
+    with FileLock(index_path):
+        kept = [
+            entry
+            for entry in read_positions_index(index_path)
+            if entry["manualROI_name"] != manualROI_name
+        ]
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w") as index_file:
+            writer = csv.writer(index_file, lineterminator="\n")
+            writer.writerow(INDEX_HEADER)
+            for entry in kept:
+                writer.writerow([entry[key] for key in INDEX_HEADER])
+            for row in rows:
+                writer.writerow([manualROI_name] + list(row))
+        replace_file(tmp_path, index_path)
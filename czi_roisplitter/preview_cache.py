@@ -0,0 +1,125 @@
+# Hernando M. Vergara
+# preview_cache.py keeps the low resolution images of the slices that have
+# been opened, so that browsing through the slices of a file does not need
+# to read them again. The least recently used ones are forgotten first.
+# Optionally the previews are also saved as tif files, to be used the next
+# time the file is opened, and the neighbouring slices can be read in the
+# background before the user asks for them. close() stops the background
+# reading when the cache is not needed anymore.
+
+# This runs inside Fiji (Jython)
+
+from __future__ import absolute_import
+
+import threading
+from collections import OrderedDict
+from os import path
+
+from ij import IJ
+from java.lang import Throwable
+from Queue import Empty, Queue
+
+
+class PreviewCache(object):
+    """
+    Cache of (image, [pixel_size, units]) of every slice name.
+    loader is a function that reads them for a slice name,
+    prefetch_loader the one used in the background (the same by default).
+    """
+
+    def __init__(
+        self, loader, capacity=8, disk_folder=None, prefetch_loader=None
+    ):
+        self.loader = loader
+        if prefetch_loader is None:
+            prefetch_loader = loader
+        self.prefetch_loader = prefetch_loader
+        self.capacity = capacity
+        # folder to save the previews, None to keep them only in memory
+        self.disk_folder = disk_folder
+        self.entries = OrderedDict()
+        # slices that are being read, so that they are not read twice
+        self.loading = {}
+        self.lock = threading.Lock()
+        self.requests = Queue()
+        self.prefetcher = None
+
+    def get(self, name):
+        # returns a copy, as the images get closed when the user is done
+        imp, calibration = self._fetch(name)
+        return imp.duplicate(), list(calibration)
+
+    def prefetch(self, names):
+        # read these slices in the background
+        for name in names:
+            self.requests.put(name)
+        if self.prefetcher is None:
+            self.prefetcher = threading.Thread(target=self._prefetch_worker)
+            self.prefetcher.setDaemon(True)
+            self.prefetcher.start()
+
+    def close(self):
+        # forgets the slices waiting to be read, and stops the background
+        # thread once it finishes the slice it is reading, if any
+        if self.prefetcher is None:
+            return
+        while True:
+            try:
+                self.requests.get_nowait()
+            except Empty:
+                break
+        # the thread stops when it gets None
+        self.requests.put(None)
+        self.prefetcher = None
+
+    def _prefetch_worker(self):
+        while True:
+            name = self.requests.get()
+            if name is None:
+                return
+            try:
+                self._fetch(name, self.prefetch_loader)
+            except (Exception, Throwable) as err:
+                print("Could not prefetch {}: {}".format(name, err))
+
+    def _fetch(self, name, loader=None):
+        with self.lock:
+            if name in self.entries:
+                # move it to the end, as the most recently used
+                entry = self.entries.pop(name)
+                self.entries[name] = entry
+                return entry
+            event = self.loading.get(name)
+            is_loader = event is None
+            if is_loader:
+                event = threading.Event()
+                self.loading[name] = event
+        if not is_loader:
+            # wait for the other thread to read it
+            event.wait()
+            return self._fetch(name, loader)
+        try:
+            entry = self._load(name, loader or self.loader)
+            with self.lock:
+                self.entries[name] = entry
+                while len(self.entries) > self.capacity:
+                    self.entries.popitem(last=False)
+        finally:
+            with self.lock:
+                del self.loading[name]
+            event.set()
+        return entry
+
+    def _load(self, name, loader):
+        disk_path = None
+        if self.disk_folder is not None:
+            disk_path = path.join(self.disk_folder, name + ".tif")
+            if path.isfile(disk_path):
+                imp = IJ.openImage(disk_path)
+                cal = imp.getCalibration()
+                return imp, [cal.pixelWidth, cal.getXUnit()]
+        imp, calibration = loader(name)
+        if disk_path is not None:
+            # saving changes the title, so save a copy
+            IJ.saveAsTiff(imp.duplicate(), disk_path)
+        return imp, calibration
@@ -0,0 +1,109 @@
+# Hernando M. Vergara
+# quality.py keeps the quality metrics of the square ROIs, measured while
+# they are saved (see tile_quality.py): how focused they are (variance of
+# the laplacian), which fraction of their pixels is saturated and which
+# fraction is tissue. They are saved, for every manual ROI, in a
+# _tile_quality.csv file next to the positions file, and the tiles below
+# the thresholds given by the user are not exported.
+
+# This is plain python, it runs both in Fiji (Jython) and in CPython
+
+from __future__ import absolute_import
+
+import csv
+from os import path
+
+from czi_roisplitter.atomic_write import replace_file
+
+QUALITY_SUFFIX = "_tile_quality.csv"
+QUALITY_HEADER = [
+    "roiID",
+    "focus",
+    "saturated_fraction",
+    "tissue_fraction",
+    "exported",
+]
+
+
+def get_quality_path(roi_output_path, manualROI_name):
+    return path.join(roi_output_path, manualROI_name + QUALITY_SUFFIX)
+
+
+def parse_quality_thresholds(text):
+    # 'minimum focus, maximum saturated fraction, minimum tissue fraction',
+    # or empty to export every tile
+    if text.strip() == "":
+        return None
+    values = [float(v) for v in text.split(",")]
+    return {
+        "min_focus": values[0],
+        "max_saturated": values[1],
+        "min_tissue": values[2],
+    }
+
+
+def get_saturation_value(bits_per_pixel, bit_depth):
+    # slide scanners save 12 or 14 bit data in 16 bit images, so the saturated
+    # value is the maximum of the bits of the file, not of the image type
+    if not bits_per_pixel:
+        bits_per_pixel = bit_depth
+    return 2 ** min(bits_per_pixel, bit_depth) - 1
+
+
+def get_histogram_fractions(histogram, tissue_threshold, max_value):
+    # fractions of saturated pixels and of pixels above the tissue threshold,
+    # from the histogram of the raw intensities
+    n_pixels = float(sum(histogram))
+    if n_pixels == 0:
+        return 0.0, 0.0
+    saturated = histogram[max_value] if max_value < len(histogram) else 0
+    first_tissue_value = int(tissue_threshold) + 1
+    tissue = sum(histogram[first_tissue_value:])
+    return saturated / n_pixels, tissue / n_pixels
+
+
+def is_usable(metrics, thresholds):
+    if thresholds is None:
+        return True
+    return (
+        metrics["focus"] >= thresholds["min_focus"]
+        and metrics["saturated_fraction"] <= thresholds["max_saturated"]
+        and metrics["tissue_fraction"] >= thresholds["min_tissue"]
+    )
+
+
+def read_quality_file(file_path):
+    # returns a list of dictionaries, one per square ROI
+    if not path.isfile(file_path):
+        return []
+    with open(file_path, "r") as quality_file:
+        return list(csv.DictReader(quality_file))
+
+
+def update_quality_file(file_path, rows):
+    """
+    Adds rows, lists of the values of QUALITY_HEADER, to the file,
+    replacing the square ROIs measured before
+    """
+    entries = dict(
+        (int(entry["roiID"]), [entry[key] for key in QUALITY_HEADER])
+        for entry in read_quality_file(file_path)
+    )
+    for row in rows:
+        entries[int(row[0])] = list(row)
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w") as quality_file:
+        writer = csv.writer(quality_file, lineterminator="\n")
+        writer.writerow(QUALITY_HEADER)
+        for roi_id in sorted(entries):
+            writer.writerow(entries[roi_id])
+    replace_file(tmp_path, file_path)
+
+
+def get_skipped_ids(file_path):
+    # square ROIs that were not exported
+    return set(
+        int(entry["roiID"])
+        for entry in read_quality_file(file_path)
+        if int(entry["exported"]) == 0
+    )
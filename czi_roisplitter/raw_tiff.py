@@ -0,0 +1,135 @@
+# Hernando M. Vergara
+# raw_tiff.py makes the header of an uncompressed, single plane tiff, so that
+# the pixels read by Bio-Formats can be written to disk right after it, as
+# they are, without making an image in ImageJ for every channel.
+# The header has the calibration as ImageJ writes it (resolution tags, and the
+# unit in the description), so the files open in ImageJ as the ones saved
+# with IJ.saveAsTiff.
+
+# This is plain python, it runs both in Fiji (Jython) and in CPython.
+
+from __future__ import absolute_import
+
+import struct
+
+# types of the tiff tags
+SHORT = 3
+LONG = 4
+RATIONAL = 5
+ASCII = 2
+# values of SampleFormat
+UNSIGNED_INT = 1
+SIGNED_INT = 2
+FLOATING_POINT = 3
+# micro sign and greek mu, built from their bytes so that they are unicode
+# both in Jython 2 and in CPython
+MICRON_UNITS = [
+    "micron",
+    "microns",
+    "um",
+    "micrometer",
+    b"\xc2\xb5m".decode("utf-8"),
+    b"\xce\xbcm".decode("utf-8"),
+]
+
+
+def get_imagej_unit(unit):
+    # the description is ascii, ImageJ writes (and reads) micrometers as
+    # 'micron'
+    if unit is not None and unit.lower() in MICRON_UNITS:
+        return "micron"
+    return unit
+
+
+def get_imagej_description(imagej_version, unit=None):
+    description = "ImageJ=" + imagej_version + "\n"
+    if unit is not None:
+        description += "unit=" + get_imagej_unit(unit) + "\n"
+    return description
+
+
+def _get_resolution(pixel_size):
+    # pixels per unit as a fraction, as ImageJ does
+    scale = 1000000
+    resolution = 1.0 / pixel_size
+    if resolution > 1000:
+        scale = 1000
+    return int(resolution * scale), scale
+
+
+def get_tiff_header(
+    width,
+    height,
+    bytes_per_pixel,
+    little_endian,
+    sample_format=UNSIGNED_INT,
+    pixel_size=None,
+    description=None,
+):
+    """
+    Header of a tiff of width x height pixels, stored in a single strip
+    that starts right after the header.
+    Returns the header as bytes.
+    """
+    order = "<" if little_endian else ">"
+    # (tag, type, count, value)
+    entries = [
+        (256, LONG, 1, width),
+        (257, LONG, 1, height),
+        (258, SHORT, 1, 8 * bytes_per_pixel),
+        (259, SHORT, 1, 1),  # no compression
+        (262, SHORT, 1, 1),
+    ]  # black is zero
+    if description is not None:
+        description = description.encode("ascii") + b"\0"
+        entries.append((270, ASCII, len(description), None))
+    entries += [
+        (273, LONG, 1, None),  # where the pixels start
+        (277, SHORT, 1, 1),
+        (278, LONG, 1, height),
+        (279, LONG, 1, width * height * bytes_per_pixel),
+    ]
+    if pixel_size is not None:
+        resolution = _get_resolution(pixel_size)
+        entries += [
+            (282, RATIONAL, 1, None),
+            (283, RATIONAL, 1, None),
+            (296, SHORT, 1, 1),
+        ]  # the unit is in the description
+    entries.append((339, SHORT, 1, sample_format))
+
+    # the values that do not fit in the entries go after the directory
+    ifd_offset = 8
+    extra_offset = ifd_offset + 2 + 12 * len(entries) + 4
+    extra = b""
+    if description is not None:
+        description_offset = extra_offset
+        extra += description
+        if len(extra) % 2:
+            extra += b"\0"
+    if pixel_size is not None:
+        resolution_offset = extra_offset + len(extra)
+        extra += struct.pack(order + "II", *resolution) * 2
+    pixels_offset = extra_offset + len(extra)
+
+    header = (b"II" if little_endian else b"MM") + struct.pack(
+        order + "HI", 42, ifd_offset
+    )
+    header += struct.pack(order + "H", len(entries))
+    for tag, tag_type, count, value in entries:
+        if tag == 270:
+            value = description_offset
+        elif tag == 273:
+            value = pixels_offset
+        elif tag == 282:
+            value = resolution_offset
+        elif tag == 283:
+            value = resolution_offset + 8
+        header += struct.pack(order + "HHI", tag, tag_type, count)
+        if tag_type == SHORT:
+            header += struct.pack(order + "HH", value, 0)
+        else:
+            header += struct.pack(order + "I", value)
+    # no more directories
+    header += struct.pack(order + "I", 0)
+    return header + extra
@@ -0,0 +1,857 @@
+# Hernando M. Vergara
+# roi_splitter.py contains the processing done by the GUI, without any window,
+# so that it can be run headless on many slices and files.
+# The GUI (czi_roisplitter.py) and the batch script (batch_split.py) use it.
+
+# This runs inside Fiji (Jython)
+
+from __future__ import absolute_import
+
+from os import makedirs, path
+
+from czi_rs_functions.czi_structure import (
+    get_binning_factor,
+    get_data_structure,
+    get_maxres_indexes,
+    open_czi_series,
+)
+from czi_rs_functions.image_manipulation import extractChannel
+from czi_rs_functions.roi_and_ov_manipulation import (
+    get_corners,
+    get_region_from_file,
+    overlay_corners,
+    overlay_roi,
+    write_roi_numbers,
+)
+from czi_rs_functions.text_manipulation import (
+    get_registered_regions_path,
+    get_registered_slices_folder,
+)
+from ij import IJ
+from ij.gui import Overlay, Roi, ShapeRoi
+from ij.io import RoiEncoder
+from ij.plugin import ContrastEnhancer
+from loci.formats import ImageReader
+
+from czi_roisplitter.downsampling import downsample_channel
+from czi_roisplitter.file_lock import FileLock
+from czi_roisplitter.focus_preview import FocusPreview
+from czi_roisplitter.instrumentation import JvmHeapProbe, RunReport
+from czi_roisplitter.manifest import TileManifest, get_manifest_path
+from czi_roisplitter.metadata_cache import load_cache, save_cache
+from czi_roisplitter.planning import (
+    choose_focus_piramid,
+    get_focus_rect,
+    get_hemisphere,
+    get_hemisphere_rect,
+    get_lowres_bin_factor,
+    get_lowres_series,
+    get_manualROI_name,
+    get_output_path,
+    get_region_name,
+    get_registration_folder_name,
+    get_registration_rescale,
+    get_slice_names,
+    get_slice_number,
+    get_square_side,
+    parse_registration_info,
+    plan_shared_reads,
+    plan_tiles,
+)
+from czi_roisplitter.positions import (
+    get_index_path,
+    update_positions_index,
+    write_positions_file,
+)
+from czi_roisplitter.preview_cache import PreviewCache
+from czi_roisplitter.quality import (
+    get_quality_path,
+    get_skipped_ids,
+    parse_quality_thresholds,
+    update_quality_file,
+)
+from czi_roisplitter.summary_layout import get_cell_name
+from czi_roisplitter.summary_renderer import (
+    SummaryRenderer,
+    update_contact_sheet,
+)
+from czi_roisplitter.tile_export import export_regions
+from czi_roisplitter.tile_quality import TileQuality, get_tissue_threshold
+from czi_roisplitter.tile_writers import OmeTiffTileWriter, TifTileWriter
+from czi_roisplitter.tiling import filter_corners, tile_coverage
+
+# number of low resolution slices kept in memory
+PREVIEWS_IN_MEMORY = 8
+# seconds to wait for another process writing the same image for registration
+REGISTRATION_LOCK_TIMEOUT = 3600
+
+
+def make_folder(folder):
+    # returns whether the folder was created. Other processes (e.g. the workers
+    # of cohort_runner.py) might be creating it at the same time
+    if path.isdir(folder):
+        return False
+    try:
+        makedirs(folder)
+    except OSError:
+        if not path.isdir(folder):
+            raise
+        return False
+    return True
+
+
+def get_roi_mask(roi):
+    # rasterizes the roi, returns its mask as rows of 0 and 1,
+    # and the position of the top left corner of the mask
+    bounds = roi.getBounds()
+    mask_ip = roi.getMask()
+    # rectangles have no mask
+    if mask_ip is None:
+        return [[1] * bounds.width for _ in range(bounds.height)], (
+            bounds.x,
+            bounds.y,
+        )
+    width = mask_ip.getWidth()
+    pixels = mask_ip.getPixels()
+    mask = []
+    for start in range(0, width * mask_ip.getHeight(), width):
+        end = start + width
+        mask.append([1 if p != 0 else 0 for p in pixels[start:end]])
+    return mask, (bounds.x, bounds.y)
+
+
+def get_hemisphere_roi(roi, hemisphere, width, height):
+    # the part of roi in the hemisphere, of an image of width x height
+    rect = get_hemisphere_rect(hemisphere, width, height)
+    if rect is None:
+        return roi
+    # 'and' is a keyword in python, so the method is called by its name
+    half = getattr(ShapeRoi(roi), "and")(ShapeRoi(Roi(*rect)))
+    if half.getBounds().isEmpty():
+        return None
+    return half.trySimplify()
+
+
+def read_file_structure(input_path, report):
+    with report.stage("metadata parse", reset_memory=True):
+        reader = ImageReader()
+        reader.setId(input_path)
+        metadata_list = reader.getCoreMetadataList()
+        # e.g. 12 bit data saved as 16 bit, to know which pixels are saturated
+        bits_per_pixel = reader.getBitsPerPixel()
+        reader.close()
+    # slide scanner makes a piramid of X for every ROI you draw
+    # resolution is not updated in the metadata so it needs to be
+    # calculated manually
+    number_of_images, num_of_piramids_list = get_data_structure(metadata_list)
+    # get the indexes of the maximum resolution images
+    max_res_indexes = get_maxres_indexes(num_of_piramids_list)
+    binFactor_list, binStep_list = get_binning_factor(
+        max_res_indexes, num_of_piramids_list, metadata_list
+    )
+    return {
+        "number_of_images": number_of_images,
+        "num_of_piramids_list": list(num_of_piramids_list),
+        "max_res_indexes": list(max_res_indexes),
+        "binFactor_list": list(binFactor_list),
+        "binStep_list": list(binStep_list),
+        "bits_per_pixel": bits_per_pixel,
+    }
+
+
+def load_file_structure(input_path, report=None):
+    # the structure of the file is cached next to it, as parsing it is slow.
+    # Nothing is written in the output folder, e.g. to list the slices
+    if report is None:
+        report = RunReport()
+    structure = load_cache(input_path)
+    if structure is None:
+        structure = read_file_structure(input_path, report)
+        save_cache(input_path, structure)
+    else:
+        print("Using the cached structure of the file")
+    return structure
+
+
+class RoiSplitter(object):
+    def __init__(self):
+        self.lr_dapi = None
+        self.roi = None
+        self.ARA_rois = []
+        self.plans = []
+        self.focus_preview = None
+        self.previews = None
+        self.new_report()
+        # the slices read in the background are not part of any save
+        self.prefetch_report = RunReport()
+
+    def new_report(self):
+        # times of every stage, saved with every manual ROI
+        self.report = RunReport(memory_probe=JvmHeapProbe())
+
+    def select_input(self, input_path, file_core_name=None):
+        # get the info about the number of images in the file
+        # stop reading the slices of the previous file
+        self.close_previews()
+        self.input_path = input_path
+        self.report.info["input_path"] = input_path
+        # if no name is given use file name
+        if file_core_name is None:
+            file_core_name = path.basename(self.input_path).split(".czi")[0]
+        self.file_core_name = file_core_name
+
+        structure = load_file_structure(self.input_path, self.report)
+        number_of_images = structure["number_of_images"]
+        self.num_of_piramids_list = structure["num_of_piramids_list"]
+        self.max_res_indexes = structure["max_res_indexes"]
+        self.binFactor_list = structure["binFactor_list"]
+        self.binStep_list = structure["binStep_list"]
+        self.bits_per_pixel = structure["bits_per_pixel"]
+        print("Number of images is " + str(number_of_images))
+        print("Number of pyramids are " + str(self.num_of_piramids_list))
+        print("Binning factors are " + str(self.binFactor_list))
+        print("Binning steps are " + str(self.binStep_list))
+        # set names of subimages in the list, waiting to compare to current
+        # outputs
+        self.possible_slices = get_slice_names(
+            self.file_core_name, number_of_images
+        )
+
+        # create output directory if it doesn't exist
+        self.output_path = get_output_path(
+            self.input_path, self.file_core_name
+        )
+        if make_folder(self.output_path):
+            print("Output path created")
+        else:
+            print("Output path was already created")
+
+        # previews of the slices of this file
+        self.previews = PreviewCache(
+            self.read_lowres_dapi,
+            capacity=PREVIEWS_IN_MEMORY,
+            prefetch_loader=self.prefetch_lowres_dapi,
+        )
+
+    def close_previews(self):
+        if self.previews is not None:
+            self.previews.close()
+
+    def set_disk_previews(self, enabled):
+        # keep the previews in a folder to open them quickly next time
+        if not enabled:
+            self.previews.disk_folder = None
+            return
+        self.previews.disk_folder = path.join(self.output_path, "000_Previews")
+        make_folder(self.previews.disk_folder)
+
+    def open_slice(self, name, prefetch=True):
+        # returns the DAPI channel of the low resolution image, not shown
+        self.name = name
+        print(self.name)
+        # parse the slice number
+        self.sl_num = get_slice_number(self.name)
+        print("Opening slice " + str(self.sl_num))
+        # rois belong to the previous slice
+        self.roi = None
+        self.ARA_rois = []
+        self.plans = []
+        self.cancel_focus_image()
+
+        if not path.exists(self.input_path):
+            print(
+                "I don't find the file, which is weird as I just found it "
+                "before"
+            )
+            self.lr_dapi = None
+            return None
+        # get the number of piramids for that image, the index of highres and
+        # the binning
+        self.num_of_piramids = self.num_of_piramids_list[self.sl_num]
+        self.high_res_index = self.max_res_indexes[self.sl_num]
+        self.binStep = self.binStep_list[self.sl_num]
+        self.binFactor = get_lowres_bin_factor(
+            self.binFactor_list[self.sl_num], self.binStep
+        )
+        self.lr_dapi, [self.res_xy_size, self.res_units] = self.previews.get(
+            self.name
+        )
+        self.lr_dapi.setTitle(self.name)
+
+        # read the neighbouring slices while the user works on this one
+        if prefetch:
+            neighbours = [
+                self.possible_slices[n]
+                for n in [self.sl_num + 1, self.sl_num - 1]
+                if 0 <= n < len(self.possible_slices)
+            ]
+            self.previews.prefetch(neighbours)
+        return self.lr_dapi
+
+    def prefetch_lowres_dapi(self, name):
+        return self.read_lowres_dapi(name, self.prefetch_report)
+
+    def read_lowres_dapi(self, name, report=None):
+        # reads the low resolution image of a slice, without changing the
+        # current one. Returns the DAPI channel and [pixel size, units]
+        if report is None:
+            report = self.report
+        sl_num = get_slice_number(name)
+        series_num = get_lowres_series(
+            self.max_res_indexes[sl_num], self.num_of_piramids_list[sl_num]
+        )
+        with report.stage("series open"):
+            low_res_image = open_czi_series(
+                self.input_path, series_num
+            )  # read the image
+        # save the resolution (every image has the high-resolution information)
+        calibration = [
+            low_res_image.getCalibration().pixelWidth,
+            low_res_image.getCalibration().getXUnit(),
+        ]
+        # play with that one, and do the real processing in the background
+        # select the DAPI channel and adjust the intensity
+        with report.stage("channel extraction"):
+            lr_dapi = extractChannel(low_res_image, 1, 1)
+        with report.stage("contrast stretch"):
+            ContrastEnhancer().stretchHistogram(lr_dapi, 0.35)
+        lr_dapi.setTitle(name)
+        lr_dapi.getCalibration().pixelWidth = calibration[0]
+        lr_dapi.getCalibration().pixelHeight = calibration[0]
+        lr_dapi.getCalibration().setUnit(calibration[1])
+
+        # clean
+        low_res_image.close()
+        low_res_image.flush()
+        return lr_dapi, calibration
+
+    def load_ARA_regions(self, ARA_regions):
+        # loads several regions, e.g. ['Both-Caudoputamen', 'Left-Amygdala'],
+        # reading every region from the file of the registration of the
+        # slice only once, also when both of its hemispheres are asked for
+        hemispheres = [
+            get_hemisphere(ARA_region) for ARA_region in ARA_regions
+        ]
+        # look for the folder and avoid conflicts
+        registration_folder = path.join(
+            path.dirname(self.output_path), "Registration/"
+        )
+        regions_folder, registration_resolution = get_registered_slices_folder(
+            registration_folder
+        )
+        # check the resolution to adjust roi later
+        res_of_lr_dapi = self.res_xy_size * self.binFactor
+        regions_transform_factor = registration_resolution / res_of_lr_dapi
+        # check that there is a zip file with the rois for this slice
+        regions_path = get_registered_regions_path(regions_folder, self.name)
+        regions = {}
+        with self.report.stage("regions read"):
+            for ARA_region in ARA_regions:
+                region_name = get_region_name(ARA_region)
+                if region_name in regions:
+                    continue
+                regions[region_name] = get_region_from_file(
+                    input_file=regions_path,
+                    region_name=region_name,
+                    image=self.lr_dapi,
+                    scale_factor=regions_transform_factor,
+                )
+
+        # get the roi of every region, cut to its hemisphere
+        self.ARA_rois = []
+        for ARA_region, hemisphere in zip(ARA_regions, hemispheres):
+            roi = regions[get_region_name(ARA_region)]
+            if roi is not None:
+                roi = get_hemisphere_roi(
+                    roi,
+                    hemisphere,
+                    self.lr_dapi.getWidth(),
+                    self.lr_dapi.getHeight(),
+                )
+            if roi is None:
+                raise ValueError(
+                    "There is no region {} in {}".format(
+                        ARA_region, regions_path
+                    )
+                )
+            self.ARA_rois.append((ARA_region, roi))
+
+        # show them
+        self.ov = Overlay()
+        for _, roi in self.ARA_rois:
+            self.ov = overlay_roi(roi, self.ov)
+        self.lr_dapi.setOverlay(self.ov)
+        self.lr_dapi.updateAndDraw()
+        return [roi for _, roi in self.ARA_rois]
+
+    def cubify_ROI(self, tile_size, roi_name="", min_coverage=0):
+        # tile_size is in units of GUI_ADJUST pixels in high resolution.
+        # roi_name is used if the roi was drawn by hand, otherwise every ARA
+        # region loaded is cubified, and named after the region.
+        # square rois with less than min_coverage (0 to 1) of their area
+        # inside the roi are discarded.
+        # Returns the corners of all the square rois
+        self.roi_output_path = path.join(
+            self.output_path, "000_ManualROIs_info"
+        )
+        # set square roi size in the low resolution level
+        self.L = get_square_side(tile_size, self.binFactor)
+        if self.ARA_rois:
+            regions = self.ARA_rois
+        else:
+            if self.roi is None:
+                self.roi = self.lr_dapi.getRoi()
+            regions = [(None, self.roi)]
+
+        self.plans = []
+        for ARA_region, roi in regions:
+            # check if this was selected from ARA regions and change naming
+            manualROI_name = get_manualROI_name(
+                self.name, roi_name, ARA_region
+            )
+            # warn the user if that ROI exists already in the processed data
+            # (ROIs saved before manifests existed have only the positions
+            # file)
+            positions_path = path.join(
+                self.roi_output_path, manualROI_name + "_roi_positions.txt"
+            )
+            if path.isfile(
+                get_manifest_path(self.roi_output_path, manualROI_name)
+            ) or path.isfile(positions_path):
+                print("#" * 18 + " " * 23 + "#" * 18)
+                print(
+                    "CAREFUL!!!! This ROI already exists in your processed "
+                    "data:"
+                )
+                print("#" * 18 + " " * 23 + "#" * 18)
+            print(manualROI_name)
+
+            # get corners
+            corners = get_corners(roi, self.L)
+            if min_coverage > 0:
+                mask, origin = get_roi_mask(roi)
+                coverage = tile_coverage(mask, corners, self.L, origin)
+                corners_cleaned = filter_corners(
+                    corners, coverage, min_coverage
+                )
+                print(
+                    "Discarded {} square ROIs with less than {} of "
+                    "their area inside the ROI".format(
+                        len(corners) - len(corners_cleaned), min_coverage
+                    )
+                )
+            else:
+                corners_cleaned = corners
+            self.plans.append(
+                {
+                    "region": roi_name if ARA_region is None else ARA_region,
+                    "manualROI_name": manualROI_name,
+                    "roi": roi,
+                    "corners": corners_cleaned,
+                }
+            )
+        self.update_overlay()
+        return [corner for plan in self.plans for corner in plan["corners"]]
+
+    def get_plans_name(self):
+        # name of all the manual rois together, e.g. for the report
+        return get_manualROI_name(
+            self.name, "+".join([plan["region"] for plan in self.plans])
+        )
+
+    def update_overlay(self, plans=None):
+        # draws the square rois of the plans, all of them by default
+        if plans is None:
+            plans = self.plans
+        self.ov = Overlay()
+        for plan in plans:
+            # get the overlay
+            plan_ov = overlay_corners(plan["corners"], self.L)
+            plan_ov = overlay_roi(plan["roi"], plan_ov)
+            # write roi name
+            plan_ov = write_roi_numbers(plan_ov, plan["corners"], self.L)
+            for roi in plan_ov.toArray():
+                self.ov.add(roi)
+        # overlay
+        self.lr_dapi.setOverlay(self.ov)
+        self.lr_dapi.updateAndDraw()
+
+    def get_focus_piramid(self, target_size):
+        # coarsest piramid in which the square rois have at least target_size
+        # pixels on their longest side
+        corners = [corner for plan in self.plans for corner in plan["corners"]]
+        _, _, w, h = get_focus_rect(
+            corners, self.L, self.binFactor, self.binStep, 1
+        )
+        return choose_focus_piramid(
+            max(w, h), self.num_of_piramids, self.binStep, target_size
+        )
+
+    def load_focus_image(self, pir_for_focus, on_loaded):
+        # open the Xth highest resolution one to see if it is in focus,
+        # in the background. on_loaded is called with the image.
+        # Returns the FocusPreview, to cancel it
+        self.cancel_focus_image()
+        corners = [corner for plan in self.plans for corner in plan["corners"]]
+        rect = get_focus_rect(
+            corners, self.L, self.binFactor, self.binStep, pir_for_focus
+        )
+        series_num = self.high_res_index + pir_for_focus - 1
+        calibration = (
+            self.res_xy_size * self.binStep ** (pir_for_focus - 1),
+            self.res_units,
+        )
+        self.focus_preview = FocusPreview(
+            self.input_path,
+            series_num,
+            rect,
+            calibration,
+            self.get_plans_name(),
+        )
+        self.focus_preview.start(on_loaded)
+        return self.focus_preview
+
+    def cancel_focus_image(self):
+        if self.focus_preview is not None:
+            self.focus_preview.cancel()
+            self.focus_preview = None
+
+    def remove_corners(self, rois_to_remove):
+        # rois_to_remove are the numbers of the square rois, starting at 1
+        if len(self.plans) != 1:
+            print(
+                "Square ROIs can only be removed when a single ROI is cubified"
+            )
+            return
+        print("Removing ROIs: {}".format(rois_to_remove))
+
+        for roi in sorted(rois_to_remove, reverse=True):
+            self.plans[0]["corners"].pop(roi - 1)
+        self.update_overlay()
+
+    def save_ROIs(
+        self,
+        registration_info="",
+        n_workers=1,
+        output_format="tif",
+        save_positions_index=True,
+        quality_thresholds="",
+        contact_sheet=False,
+    ):
+        # saves the square rois of every cubified roi, in a single pass
+        # over the high resolution image.
+        # quality_thresholds is 'minimum focus, maximum saturated fraction,
+        # minimum tissue fraction' of the tiles to export, empty to export all.
+        # contact_sheet adds the rois to the contact sheet of the slide
+        # save the low resolution image for registration
+        self.save_registration_image(registration_info)
+
+        print("Saving ROIs")
+
+        # create a file to save the ROI coordinates
+        # create output directory if it doesn't exist
+        if make_folder(self.roi_output_path):
+            print("Output path for ROIs created")
+        else:
+            print("Output path for ROIs information was already created")
+
+        if output_format == "ome-tiff":
+            writer_class = OmeTiffTileWriter
+        else:
+            writer_class = TifTileWriter
+        region_tiles = []
+        region_positions = []
+        manifests = []
+        for plan in self.plans:
+            manualROI_name = plan["manualROI_name"]
+            # get the square rois in high resolution coordinates
+            tiles, positions = plan_tiles(
+                plan["corners"], self.L, self.binFactor, manualROI_name
+            )
+            region_positions.append(positions)
+            # the manifest tells which tiles were already saved in a previous
+            # run
+            manifest = TileManifest(
+                get_manifest_path(self.roi_output_path, manualROI_name)
+            )
+            if writer_class.resumable:
+                pending_tiles = manifest.get_pending(tiles)
+                if len(pending_tiles) < len(tiles):
+                    print(
+                        "{} square ROIs of {} were already saved, "
+                        "skipping them".format(
+                            len(tiles) - len(pending_tiles), manualROI_name
+                        )
+                    )
+            else:
+                manifest.reset()
+                pending_tiles = tiles
+            region_tiles.append(pending_tiles)
+            manifests.append(manifest)
+
+        # tiles of different rois that overlap are read only once,
+        # the tiles of every roi are written in the order they are read
+        groups, ordered_tiles = plan_shared_reads(region_tiles)
+        print(
+            "Reading {} square ROIs in {} regions of the high "
+            "resolution image".format(
+                sum([len(tiles) for tiles in region_tiles]), len(groups)
+            )
+        )
+        # open the high resolution image on every roi and save each channel
+        calibration = (self.res_xy_size, self.res_units)
+        outputs = []
+        for plan, tiles, manifest in zip(self.plans, ordered_tiles, manifests):
+            if writer_class is OmeTiffTileWriter:
+                writer = OmeTiffTileWriter(
+                    path.join(
+                        self.output_path, plan["manualROI_name"] + ".ome.tif"
+                    ),
+                    tiles,
+                    calibration,
+                    self.report,
+                )
+            else:
+                writer = TifTileWriter(self.output_path, self.report)
+            outputs.append((writer, manifest))
+        # every tile is measured from its DAPI channel while it is exported
+        quality = TileQuality(
+            get_tissue_threshold(self.lr_dapi),
+            parse_quality_thresholds(quality_thresholds),
+            bits_per_pixel=self.bits_per_pixel,
+        )
+        self.report.info["n_workers"] = n_workers
+        self.report.info["output_format"] = output_format
+        self.report.info["quality_thresholds"] = quality.thresholds
+        with self.report.stage("tiles export", reset_memory=True):
+            export_regions(
+                self.input_path,
+                self.high_res_index,
+                groups,
+                outputs,
+                calibration,
+                n_workers=n_workers,
+                report=self.report,
+                quality=quality,
+            )
+        print("ROIs saved, saving quality and positions")
+
+        for plan, tiles, positions in zip(
+            self.plans, region_tiles, region_positions
+        ):
+            manualROI_name = plan["manualROI_name"]
+            # tiles saved in a previous run keep their metrics
+            quality_path = get_quality_path(
+                self.roi_output_path, manualROI_name
+            )
+            update_quality_file(quality_path, quality.get_rows(tiles))
+            # the tiles not exported are left out of the positions
+            skipped_ids = get_skipped_ids(quality_path)
+            if skipped_ids:
+                print(
+                    "{} square ROIs of {} were not exported for their "
+                    "quality".format(len(skipped_ids), manualROI_name)
+                )
+            positions = [p for p in positions if p[0] not in skipped_ids]
+            # save the coordinates of every ROI in a file, and in the index of
+            # the animal
+            roi_points_file_path = path.join(
+                self.roi_output_path, manualROI_name + "_roi_positions.txt"
+            )
+            with self.report.stage("positions write"):
+                write_positions_file(
+                    roi_points_file_path,
+                    [
+                        [
+                            roi_id,
+                            xt,
+                            yt,
+                            self.reg_final_res,
+                            self.res_xy_size,
+                            self.res_units,
+                        ]
+                        for roi_id, xt, yt, _ in positions
+                    ],
+                )
+                if save_positions_index:
+                    update_positions_index(
+                        get_index_path(self.roi_output_path),
+                        manualROI_name,
+                        [
+                            [
+                                roi_id,
+                                xt,
+                                yt,
+                                Lt,
+                                self.reg_final_res,
+                                self.res_xy_size,
+                                self.res_units,
+                            ]
+                            for roi_id, xt, yt, Lt in positions
+                        ],
+                    )
+        print("Saving summary figure")
+
+        # save summary
+        # create output directory if it doesn't exist
+        self.summary_output_path = path.join(
+            self.output_path, "000_Summary_of_ROIs"
+        )
+        if make_folder(self.summary_output_path):
+            print("Output path for summary created")
+        else:
+            print("Output path for summary was already created")
+        cells_folder = path.join(
+            self.summary_output_path, "000_Contact_sheet_cells"
+        )
+        if contact_sheet:
+            make_folder(cells_folder)
+        # drawn off-screen, on a downsampled copy of the low resolution image
+        with self.report.stage("summary", reset_memory=True):
+            renderer = SummaryRenderer(self.lr_dapi, self.L)
+        for plan in self.plans:
+            with self.report.stage("summary", reset_memory=True):
+                imp = renderer.render([plan], plan["manualROI_name"])
+                IJ.saveAsTiff(
+                    imp,
+                    path.join(
+                        self.summary_output_path,
+                        plan["manualROI_name"] + "_summaryImage",
+                    ),
+                )
+                imp.flush()
+                if contact_sheet:
+                    cell = renderer.render_cell(plan)
+                    IJ.saveAsTiff(
+                        cell,
+                        path.join(
+                            cells_folder, get_cell_name(plan["manualROI_name"])
+                        ),
+                    )
+                    cell.flush()
+            # save manual ROI
+            RoiEncoder.save(
+                plan["roi"],
+                path.join(self.roi_output_path, plan["manualROI_name"]),
+            )
+        if contact_sheet:
+            with self.report.stage("contact sheet"):
+                update_contact_sheet(
+                    cells_folder,
+                    path.join(
+                        self.summary_output_path,
+                        self.file_core_name + "_contactSheet.tif",
+                    ),
+                    self.file_core_name,
+                )
+        print("summary images and roi information saved")
+        self.save_report()
+
+    def save_report(self):
+        # save the times of these manual ROIs, and start again for the next
+        # ones
+        report_output_path = path.join(self.output_path, "000_Run_reports")
+        make_folder(report_output_path)
+        report_name = self.get_plans_name()
+        self.report.info["manualROI_name"] = report_name
+        self.report.info["number_of_square_ROIs"] = sum(
+            [len(plan["corners"]) for plan in self.plans]
+        )
+        self.report.save(
+            path.join(report_output_path, report_name + "_report.json")
+        )
+        print(self.report.summary())
+        self.new_report()
+        self.report.info["input_path"] = self.input_path
+
+    def save_registration_image(self, registration_info):
+        # registration_info is 'piramid number, channel, final resolution'
+        # make this conditional to the text
+        reg_info = parse_registration_info(registration_info)
+        if reg_info is None:
+            self.reg_final_res = 0
+            return
+        reg_pir_num, reg_channel, self.reg_final_res = reg_info
+
+        output_res_path = get_registration_folder_name(
+            reg_channel, self.reg_final_res
+        )
+        self.forreg_output_path = path.join(
+            path.dirname(self.output_path), "Registration", output_res_path
+        )
+
+        if make_folder(self.forreg_output_path):
+            print("Output path for low resolution slices created")
+        else:
+            print("Output path for low resolution slices was already created")
+
+        # check that this slice has not been saved before, while no other
+        # process (e.g. working on another region of the slice) is saving it
+        reg_slice_name = path.join(self.forreg_output_path, self.name)
+        with FileLock(
+            reg_slice_name + ".tif", timeout=REGISTRATION_LOCK_TIMEOUT
+        ):
+            if path.isfile(reg_slice_name + ".tif"):
+                print("Registration slice already exists")
+            else:
+                # save otherwise
+                print(
+                    "Saving for registration channel {} at {} um/px".format(
+                        reg_channel, self.reg_final_res
+                    )
+                )
+                # get the Xth resolution image and Xth channel for saving it
+                # for registration
+                series_num = self.high_res_index + reg_pir_num
+                # convert to Xum/px so that it can be aligned to ARA
+                rescale_factor = get_registration_rescale(
+                    self.binStep,
+                    reg_pir_num,
+                    self.res_xy_size,
+                    self.reg_final_res,
+                )
+                # read only that channel, a strip at a time, averaging it down
+                with self.report.stage(
+                    "registration downsampling", reset_memory=True
+                ):
+                    self.regist_image = downsample_channel(
+                        self.input_path,
+                        series_num,
+                        reg_channel,
+                        rescale_factor,
+                        self.name,
+                        self.report,
+                    )
+                # reset min and max automatically
+                with self.report.stage("contrast stretch"):
+                    ContrastEnhancer().stretchHistogram(
+                        self.regist_image, 0.35
+                    )
+                # convert to 8-bit (which also applies the contrast)
+                # ImageConverter(self.regist_image).convertToGray8()
+                # Add the information to the metadata
+                self.regist_image.getCalibration().pixelWidth = (
+                    self.reg_final_res
+                )
+                self.regist_image.getCalibration().pixelHeight = (
+                    self.reg_final_res
+                )
+                self.regist_image.getCalibration().pixelDepth = 1
+                self.regist_image.getCalibration().setXUnit("micrometer")
+                self.regist_image.getCalibration().setYUnit("micrometer")
+                self.regist_image.getCalibration().setZUnit("micrometer")
+                with self.report.stage("tiff write") as stage:
+                    IJ.saveAsTiff(self.regist_image, reg_slice_name)
+                    stage.add_written(path.getsize(reg_slice_name + ".tif"))
+                self.regist_image.close()
+                self.regist_image.flush()
+                print("Slice for registration saved")
+
+    def close_slice(self):
+        # stop reading slices in the background, e.g. in batch_split.py the
+        # splitter is thrown away after the last slice
+        self.close_previews()
+        if self.lr_dapi is not None:
+            self.lr_dapi.close()
+            self.lr_dapi.flush()
+            self.lr_dapi = None
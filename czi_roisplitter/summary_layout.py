@@ -0,0 +1,92 @@
+# Hernando M. Vergara
+# summary_layout.py has the geometry of the summary images: the scale of the
+# buffer they are drawn in, where the squares and their numbers go in it, the
+# crop of every manual ROI for the contact sheet of a slide, and where each of
+# them goes in the sheet. The drawing is done by summary_renderer.py.
+
+# This is plain python, it runs both in Fiji (Jython) and in CPython
+
+from __future__ import absolute_import
+
+from czi_roisplitter.planning import get_slice_number
+
+# longest side of the summary images, in pixels
+SUMMARY_MAX_SIZE = 2048
+# side of the image of every manual ROI in the contact sheet, and their number
+# per row
+CONTACT_SHEET_CELL = 256
+CONTACT_SHEET_COLUMNS = 6
+# space left around the manual ROI in its image of the contact sheet, as a
+# fraction of its size
+CELL_MARGIN = 0.1
+# size of the font of the numbers of the squares
+MIN_LABEL_SIZE = 8
+MAX_LABEL_SIZE = 24
+CELL_SUFFIX = "_summaryCell.tif"
+
+
+def get_summary_scale(width, height, max_size=SUMMARY_MAX_SIZE):
+    # the summary is never bigger than the low resolution image
+    return min(1.0, float(max_size) / max(width, height))
+
+
+def scale_square(corner, L, scale, x0=0, y0=0):
+    # [x, y, side] in the buffer of a square roi of the low resolution image,
+    # x0 and y0 being the origin of the buffer once scaled
+    x, y = corner
+    return [
+        int(round(x * scale - x0)),
+        int(round(y * scale - y0)),
+        max(1, int(round(L * scale))),
+    ]
+
+
+def get_label_size(side):
+    return max(MIN_LABEL_SIZE, min(MAX_LABEL_SIZE, side // 3))
+
+
+def get_crop_rect(bounds, width, height, margin=CELL_MARGIN):
+    # square [x, y, w, h] around bounds, within the image when possible
+    x, y, w, h = bounds
+    side = int(max(w, h) * (1 + 2 * margin))
+    side = max(1, min(side, width, height))
+    cx = x + w // 2 - side // 2
+    cy = y + h // 2 - side // 2
+    cx = max(0, min(cx, width - side))
+    cy = max(0, min(cy, height - side))
+    return [cx, cy, side, side]
+
+
+def get_contact_sheet_layout(
+    n_cells, cell_size=CONTACT_SHEET_CELL, columns=CONTACT_SHEET_COLUMNS
+):
+    # returns the width and height of the sheet, and the [x, y] of every cell
+    columns = max(1, min(columns, n_cells))
+    rows = (n_cells + columns - 1) // columns
+    positions = [
+        [(i % columns) * cell_size, (i // columns) * cell_size]
+        for i in range(n_cells)
+    ]
+    return columns * cell_size, rows * cell_size, positions
+
+
+def get_cell_name(manualROI_name):
+    return manualROI_name + CELL_SUFFIX
+
+
+def get_contact_sheet_cells(file_names, file_core_name):
+    # names of the manual ROIs of the slide with an image for the contact
+    # sheet, sorted by slice
+    prefix = file_core_name + "_slice-"
+    names = [
+        f[: -len(CELL_SUFFIX)]
+        for f in file_names
+        if f.startswith(prefix) and f.endswith(CELL_SUFFIX)
+    ]
+    return sorted(
+        names,
+        key=lambda name: (
+            get_slice_number(name.split("_manualROI-")[0]),
+            name,
+        ),
+    )
@@ -0,0 +1,155 @@
+# Hernando M. Vergara
+# summary_renderer.py draws the summary images of the manual ROIs: their
+# outline, the grid of square rois and their numbers (as overlay_corners,
+# overlay_roi and write_roi_numbers do in the GUI), straight into a
+# downsampled RGB copy of the low resolution image. No overlay is flattened
+# and no window is needed, so it also runs headless.
+# Optionally, a small image of every manual ROI is kept, and they are put
+# together in a contact sheet of the whole slide.
+
+# This runs inside Fiji (Jython)
+
+from __future__ import absolute_import
+
+from os import listdir, path
+
+from ij import IJ, ImagePlus
+from ij.plugin import RoiScaler
+from ij.process import ColorProcessor
+from java.awt import Color, Font
+
+from czi_roisplitter.file_lock import FileLock
+from czi_roisplitter.summary_layout import (
+    CONTACT_SHEET_CELL,
+    SUMMARY_MAX_SIZE,
+    get_cell_name,
+    get_contact_sheet_cells,
+    get_contact_sheet_layout,
+    get_crop_rect,
+    get_label_size,
+    get_summary_scale,
+    scale_square,
+)
+
+ROI_COLOR = Color.yellow
+GRID_COLOR = Color.cyan
+NUMBER_COLOR = Color.white
+
+
+def draw_plan(ip, plan, L, scale, x0=0, y0=0):
+    # draws the manual roi and its squares, of the low resolution image, in ip
+    roi = RoiScaler.scale(plan["roi"], scale, scale, False)
+    roi.setLocation(
+        int(round(roi.getXBase() - x0)), int(round(roi.getYBase() - y0))
+    )
+    ip.setLineWidth(1)
+    ip.setColor(ROI_COLOR)
+    roi.drawPixels(ip)
+    squares = [
+        scale_square(corner, L, scale, x0, y0) for corner in plan["corners"]
+    ]
+    if not squares:
+        return
+    label_size = get_label_size(squares[0][2])
+    ip.setFont(Font("SansSerif", Font.PLAIN, label_size))
+    ip.setAntialiasedText(True)
+    for roiID, (x, y, side) in enumerate(squares, 1):
+        ip.setColor(GRID_COLOR)
+        ip.drawRect(x, y, side, side)
+        ip.setColor(NUMBER_COLOR)
+        ip.drawString(str(roiID), x + 2, y + label_size + 1)
+
+
+class SummaryRenderer(object):
+    """
+    Summary images of the plans of RoiSplitter.cubify_ROI,
+    drawn on a copy of imp (the low resolution image) that is
+    scaled down once to max_size and then reused for every plan
+    """
+
+    def __init__(self, imp, L, max_size=SUMMARY_MAX_SIZE):
+        self.L = L
+        self.scale = get_summary_scale(
+            imp.getWidth(), imp.getHeight(), max_size
+        )
+        # 8-bit with the contrast of the display, never the image itself
+        if imp.getBitDepth() == 8:
+            ip = imp.getProcessor().duplicate()
+        else:
+            ip = imp.getProcessor().convertToByteProcessor(True)
+        if self.scale < 1:
+            ip = ip.resize(
+                int(imp.getWidth() * self.scale),
+                int(imp.getHeight() * self.scale),
+                True,
+            )
+        self.base = ip
+
+    def render(self, plans, title=""):
+        ip = self.base.convertToRGB()
+        for plan in plans:
+            draw_plan(ip, plan, self.L, self.scale)
+        return ImagePlus(title, ip)
+
+    def render_cell(self, plan, cell_size=CONTACT_SHEET_CELL):
+        # the manual roi, cropped and scaled to cell_size, with its name
+        bounds = plan["roi"].getBounds()
+        crop = get_crop_rect(
+            [
+                int(bounds.x * self.scale),
+                int(bounds.y * self.scale),
+                int(bounds.width * self.scale),
+                int(bounds.height * self.scale),
+            ],
+            self.base.getWidth(),
+            self.base.getHeight(),
+        )
+        self.base.setRoi(crop[0], crop[1], crop[2], crop[3])
+        cropped = self.base.crop()
+        self.base.resetRoi()
+        factor = float(cell_size) / crop[2]
+        ip = ColorProcessor(cell_size, cell_size)
+        ip.insert(
+            cropped.resize(
+                cell_size, int(crop[3] * factor), True
+            ).convertToRGB(),
+            0,
+            0,
+        )
+        draw_plan(
+            ip,
+            plan,
+            self.L,
+            self.scale * factor,
+            crop[0] * factor,
+            crop[1] * factor,
+        )
+        ip.setFont(Font("SansSerif", Font.PLAIN, 12))
+        ip.setColor(NUMBER_COLOR)
+        ip.drawString(
+            plan["manualROI_name"].split("_manualROI-")[-1], 2, 14, Color.black
+        )
+        return ImagePlus(plan["manualROI_name"], ip)
+
+
+def update_contact_sheet(
+    cells_folder, sheet_path, file_core_name, cell_size=CONTACT_SHEET_CELL
+):
+    # puts together the images of all the manual rois of the slide saved so
+    # far. Other processes (e.g. the workers of cohort_runner.py) might add
+    # theirs
+    with FileLock(sheet_path):
+        names = get_contact_sheet_cells(listdir(cells_folder), file_core_name)
+        if not names:
+            return
+        width, height, positions = get_contact_sheet_layout(
+            len(names), cell_size
+        )
+        sheet = ColorProcessor(width, height)
+        for name, (x, y) in zip(names, positions):
+            cell = IJ.openImage(path.join(cells_folder, get_cell_name(name)))
+            if cell is None:
+                continue
+            sheet.insert(cell.getProcessor(), x, y)
+            cell.close()
+        IJ.saveAsTiff(ImagePlus(file_core_name, sheet), sheet_path)
@@ -0,0 +1,203 @@
+# Hernando M. Vergara
+# tile_export.py saves the square ROIs (tiles) of the high resolution image
+# with one of the writers of tile_writers.py, either serially or with a pool
+# of workers.
+# Every worker has its own reader, so decoding and writing of different
+# tiles overlap. Tiles waiting for a worker are kept in a bounded queue,
+# and each worker holds a single tile at a time, so memory is capped by
+# the number of workers and not by the number of tiles.
+# If a manifest is given, every tile saved is recorded in it.
+# If a report is given, the time and bytes of every tile are recorded in it.
+# export_regions saves the tiles of several regions (each with its writer)
+# in a single pass, reading once the pixels of the tiles that overlap.
+# If a TileQuality is given, every tile is measured before saving it, and
+# the ones below its thresholds are not saved, if the writer allows it.
+
+# This runs inside Fiji (Jython)
+
+from __future__ import absolute_import
+
+import threading
+import time
+from os import path
+
+from java.lang import Throwable
+from Queue import Queue
+
+from czi_roisplitter.instrumentation import RunReport
+from czi_roisplitter.tile_reader import SharedRegionReader, TileReader
+
+
+def _save_tile(
+    writer, manifest, report, tile_reader, index, roi_name, rect, quality=None
+):
+    start = time.time()
+    if quality is not None:
+        # the channel measured is kept to write it, it is not read twice
+        tile_reader = SharedRegionReader(
+            tile_reader, rect, channels=[quality.channel]
+        )
+        with report.stage("quality metrics"):
+            usable = quality.measure(tile_reader, roi_name, rect)
+        if not usable and writer.skippable:
+            print(
+                "   -> skipping {}, below the quality thresholds".format(
+                    roi_name
+                )
+            )
+            quality.set_skipped(roi_name)
+            return
+    file_paths = writer.write_tile(tile_reader, index, roi_name, rect)
+    report.add_tile(
+        roi_name,
+        time.time() - start,
+        tile_reader.region_bytes(rect) * tile_reader.n_channels,
+        sum(path.getsize(f) for f in file_paths),
+    )
+    if manifest is not None:
+        manifest.mark_done(roi_name, rect, file_paths)
+
+
+def _save_group(outputs, report, tile_reader, group, quality=None):
+    rect, members = group
+    # tiles of different regions that overlap are read together
+    if len(members) > 1:
+        tile_reader = SharedRegionReader(tile_reader, rect)
+    try:
+        for region_num, index, roi_name, tile_rect in members:
+            writer, manifest = outputs[region_num]
+            _save_tile(
+                writer,
+                manifest,
+                report,
+                tile_reader,
+                index,
+                roi_name,
+                tile_rect,
+                quality,
+            )
+    finally:
+        if len(members) > 1:
+            tile_reader.close()
+
+
+def _abort(outputs):
+    for writer, _ in outputs:
+        writer.abort()
+
+
+def _export_worker(
+    input_path, series_num, calibration, outputs, report, quality, jobs, errors
+):
+    tile_reader = None
+    try:
+        tile_reader = TileReader(input_path, series_num, report)
+        tile_reader.set_calibration(*calibration)
+    except (Exception, Throwable) as err:
+        errors.append(err)
+        _abort(outputs)
+    # keep taking jobs after an error, so that the queue never blocks
+    while True:
+        group = jobs.get()
+        if group is None:
+            break
+        if errors:
+            continue
+        try:
+            _save_group(outputs, report, tile_reader, group, quality)
+        except (Exception, Throwable) as err:
+            errors.append(err)
+            _abort(outputs)
+    if tile_reader is not None:
+        tile_reader.close()
+
+
+def export_regions(
+    input_path,
+    series_num,
+    groups,
+    outputs,
+    calibration,
+    n_workers=1,
+    max_in_flight=None,
+    report=None,
+    quality=None,
+):
+    """
+    Saves the tiles of several regions in one pass over the series.
+    groups are the tiles read together, as given by planning.plan_shared_reads,
+    and outputs is a list of (writer, manifest), one per region.
+    """
+    if report is None:
+        report = RunReport()
+    try:
+        if n_workers <= 1:
+            with TileReader(input_path, series_num, report) as tile_reader:
+                tile_reader.set_calibration(*calibration)
+                for group in groups:
+                    for member in group[1]:
+                        print("   -> processing " + member[2])
+                    _save_group(outputs, report, tile_reader, group, quality)
+            return
+        _export_parallel(
+            input_path,
+            series_num,
+            groups,
+            outputs,
+            calibration,
+            n_workers,
+            max_in_flight,
+            report,
+            quality,
+        )
+    finally:
+        for writer, _ in outputs:
+            writer.close()
+
+
+def _export_parallel(
+    input_path,
+    series_num,
+    groups,
+    outputs,
+    calibration,
+    n_workers,
+    max_in_flight,
+    report,
+    quality,
+):
+    if max_in_flight is None:
+        max_in_flight = 2 * n_workers
+    jobs = Queue(max_in_flight)
+    errors = []
+    workers = [
+        threading.Thread(
+            target=_export_worker,
+            args=(
+                input_path,
+                series_num,
+                calibration,
+                outputs,
+                report,
+                quality,
+                jobs,
+                errors,
+            ),
+        )
+        for _ in range(n_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    for group in groups:
+        if errors:
+            break
+        for member in group[1]:
+            print("   -> processing " + member[2])
+        jobs.put(group)
+    # tell the workers to finish
+    for _ in workers:
+        jobs.put(None)
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,105 @@
+# Hernando M. Vergara
+# tile_quality.py measures the square ROIs while they are exported, from the
+# pixels of one channel (DAPI by default) that are read anyway to save them:
+# - focus: variance of the laplacian, higher is sharper
+# - saturated fraction: pixels at the maximum value of the file (from its
+#   bits per pixel, e.g. 4095 for 12 bit data saved as 16 bit)
+# - tissue fraction: pixels above the threshold of the slice (Otsu on its
+#   low resolution image)
+# The metrics are kept with the functions of quality.py.
+
+# This runs inside Fiji (Jython)
+
+from __future__ import absolute_import
+
+import threading
+
+from ij.process import AutoThresholder, ImageProcessor
+
+from czi_roisplitter.quality import (
+    get_histogram_fractions,
+    get_saturation_value,
+    is_usable,
+)
+from czi_roisplitter.tile_writers import get_roi_id
+
+LAPLACIAN = [0, 1, 0, 1, -4, 1, 0, 1, 0]
+
+
+def get_tissue_threshold(imp):
+    # threshold between background and tissue, in the intensities of the file
+    ip = imp.getProcessor().duplicate()
+    ip.resetMinAndMax()
+    ip.setAutoThreshold(
+        AutoThresholder.Method.Otsu, True, ImageProcessor.NO_LUT_UPDATE
+    )
+    return ip.getMinThreshold()
+
+
+class TileQuality(object):
+    """
+    Metrics of the tiles, by roi name.
+    thresholds are given by quality.parse_quality_thresholds,
+    None to export every tile.
+    bits_per_pixel are the bits really used by the file, None for all of
+    the image type.
+    """
+
+    def __init__(
+        self, tissue_threshold, thresholds=None, channel=1, bits_per_pixel=None
+    ):
+        self.tissue_threshold = tissue_threshold
+        self.bits_per_pixel = bits_per_pixel
+        self.thresholds = thresholds
+        self.channel = channel
+        self.lock = threading.Lock()
+        # roi_name -> {'focus', 'saturated_fraction', 'tissue_fraction',
+        # 'exported'}
+        self.metrics = {}
+
+    def measure(self, tile_reader, roi_name, rect):
+        # returns whether the tile is good enough to be exported
+        ip = tile_reader.read_processor(self.channel, rect)
+        laplacian = ip.convertToFloat()
+        if laplacian is ip:
+            laplacian = ip.duplicate()
+        laplacian.convolve3x3(LAPLACIAN)
+        metrics = {"focus": laplacian.getStatistics().stdDev ** 2}
+        # saturation and tissue from the histogram of the raw values
+        saturated_fraction, tissue_fraction = 0.0, 0.0
+        if ip.getBitDepth() in [8, 16]:
+            saturated_fraction, tissue_fraction = get_histogram_fractions(
+                ip.getHistogram(),
+                self.tissue_threshold,
+                get_saturation_value(self.bits_per_pixel, ip.getBitDepth()),
+            )
+        metrics["saturated_fraction"] = saturated_fraction
+        metrics["tissue_fraction"] = tissue_fraction
+        usable = is_usable(metrics, self.thresholds)
+        metrics["exported"] = 1
+        with self.lock:
+            self.metrics[roi_name] = metrics
+        return usable
+
+    def set_skipped(self, roi_name):
+        with self.lock:
+            self.metrics[roi_name]["exported"] = 0
+
+    def get_rows(self, tiles):
+        # rows of the quality file for the tiles, (roi_name, rect), that were
+        # measured
+        rows = []
+        for roi_name, _ in tiles:
+            metrics = self.metrics.get(roi_name)
+            if metrics is None:
+                continue
+            rows.append(
+                [
+                    get_roi_id(roi_name),
+                    metrics["focus"],
+                    metrics["saturated_fraction"],
+                    metrics["tissue_fraction"],
+                    metrics["exported"],
+                ]
+            )
+        return rows
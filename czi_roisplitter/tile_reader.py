@@ -0,0 +1,167 @@
+# Hernando M. Vergara
+# tile_reader.py keeps a single Bio-Formats reader open on one series of a
+# .czi file, and serves square ROIs (tiles) from it channel by channel.
+# Opening the reader parses the whole .czi header, which for big slides
+# takes a long time, so it should be done once per series and not per tile.
+# The parsed reader is also memoized by Bio-Formats in a .bfmemo file next
+# to the .czi, so that the next time (or another worker) opens it quickly.
+# SharedRegionReader reads a region once and serves the tiles inside it,
+# for the tiles of different regions that overlap.
+
+# This runs inside Fiji (Jython)
+
+from __future__ import absolute_import
+
+from ij.process import ByteProcessor, FloatProcessor, ShortProcessor
+from jarray import zeros
+from java.lang import System
+from loci.common import DataTools
+from loci.formats import ChannelSeparator, FormatTools, Memoizer
+from loci.plugins.util import ImageProcessorReader, LociPrefs
+
+from czi_roisplitter.instrumentation import RunReport
+
+
+class TileReader(object):
+    """
+    Reader of rectangular regions of one series of a .czi file.
+    Use it as a context manager, or call close() when done.
+    The opening and the reading are timed in the report, if given.
+    """
+
+    def __init__(self, input_path, series_num, report=None):
+        if report is None:
+            report = RunReport()
+        self.report = report
+        with self.report.stage("series open"):
+            # the channel separator makes every plane a single channel
+            self.reader = ImageProcessorReader(
+                ChannelSeparator(Memoizer(LociPrefs.makeImageReader(), 0))
+            )
+            self.reader.setId(input_path)
+            self.reader.setSeries(series_num)
+        self.series_num = series_num
+        self.size_x = self.reader.getSizeX()
+        self.size_y = self.reader.getSizeY()
+        self.n_channels = self.reader.getSizeC()
+        self.pixel_type = self.reader.getPixelType()
+        self.little_endian = self.reader.isLittleEndian()
+        self.bytes_per_pixel = FormatTools.getBytesPerPixel(self.pixel_type)
+        # calibration is set by the caller, as it is not reliable
+        # for every series of the piramid
+        self.pixel_size = None
+        self.units = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def set_calibration(self, pixel_size, units):
+        self.pixel_size = pixel_size
+        self.units = units
+
+    def clip_rect(self, rect):
+        # Bio-Formats fails if the region goes beyond the image,
+        # so crop it to the image size
+        x, y, w, h = [int(v) for v in rect]
+        x = max(0, min(x, self.size_x - 1))
+        y = max(0, min(y, self.size_y - 1))
+        w = max(1, min(w, self.size_x - x))
+        h = max(1, min(h, self.size_y - y))
+        return [x, y, w, h]
+
+    def region_bytes(self, rect):
+        # size in memory of a channel of the region
+        _, _, w, h = self.clip_rect(rect)
+        return w * h * self.bytes_per_pixel
+
+    def read_processor(self, channel, rect):
+        # channel starts at 1, as in ImageJ
+        x, y, w, h = self.clip_rect(rect)
+        plane = self.reader.getIndex(0, channel - 1, 0)
+        with self.report.stage("channel extraction") as stage:
+            processor = self.reader.openProcessors(plane, x, y, w, h)[0]
+            stage.add_read(self.region_bytes(rect))
+        return processor
+
+    def read_bytes(self, channel, rect):
+        # raw pixels of the region, as stored in the file
+        x, y, w, h = self.clip_rect(rect)
+        plane = self.reader.getIndex(0, channel - 1, 0)
+        with self.report.stage("channel extraction") as stage:
+            pixels = self.reader.openBytes(plane, x, y, w, h)
+            stage.add_read(len(pixels))
+        return pixels
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+class SharedRegionReader(TileReader):
+    """
+    Serves the tiles inside rect from a single read of it with tile_reader.
+    Every channel is read the first time a tile asks for it.
+    Only the channels given are kept, all of them by default.
+    """
+
+    def __init__(self, tile_reader, rect, channels=None):
+        self.base = tile_reader
+        self.report = tile_reader.report
+        self.reader = None
+        self.series_num = tile_reader.series_num
+        self.size_x = tile_reader.size_x
+        self.size_y = tile_reader.size_y
+        self.n_channels = tile_reader.n_channels
+        self.pixel_type = tile_reader.pixel_type
+        self.little_endian = tile_reader.little_endian
+        self.bytes_per_pixel = tile_reader.bytes_per_pixel
+        self.pixel_size = tile_reader.pixel_size
+        self.units = tile_reader.units
+        self.rect = tile_reader.clip_rect(rect)
+        self.channels = channels
+        # channel -> pixels of the whole rect
+        self.planes = {}
+
+    def read_bytes(self, channel, rect):
+        if self.channels is not None and channel not in self.channels:
+            return self.base.read_bytes(channel, rect)
+        if channel not in self.planes:
+            self.planes[channel] = self.base.read_bytes(channel, self.rect)
+        region = self.planes[channel]
+        # copy the rows of the tile out of the region
+        x, y, w, h = self.clip_rect(rect)
+        rx, ry, rw, _ = self.rect
+        row_bytes = w * self.bytes_per_pixel
+        pixels = zeros(row_bytes * h, "b")
+        for row in range(h):
+            System.arraycopy(
+                region,
+                ((y - ry + row) * rw + x - rx) * self.bytes_per_pixel,
+                pixels,
+                row * row_bytes,
+                row_bytes,
+            )
+        return pixels
+
+    def read_processor(self, channel, rect):
+        # as ImageProcessorReader does, for the pixel types of the scanner
+        _, _, w, h = self.clip_rect(rect)
+        data = DataTools.makeDataArray(
+            self.read_bytes(channel, rect),
+            self.bytes_per_pixel,
+            FormatTools.isFloatingPoint(self.pixel_type),
+            self.little_endian,
+        )
+        if self.bytes_per_pixel == 1:
+            return ByteProcessor(w, h, data)
+        if self.bytes_per_pixel == 2:
+            return ShortProcessor(w, h, data, None)
+        return FloatProcessor(w, h, data)
+
+    def close(self):
+        # the reader belongs to the caller
+        self.planes = {}
@@ -0,0 +1,233 @@
+# Hernando M. Vergara
+# tile_writers.py contains the ways of saving the square ROIs (tiles):
+# - TifTileWriter saves one tif file per channel of every tile (the default),
+#   writing the pixels as read, without an image in memory for every channel
+# - OmeTiffTileWriter saves all the tiles of a manual ROI in a single
+#   compressed and tiled OME-TIFF, with one series per square ROI, and
+#   a csv index of the position of each of them in the high resolution image
+# Both are used by tile_export.py, which can call them from several threads.
+# write_tile returns the files written for that tile, to keep track of them.
+# Only TifTileWriter is resumable, as it writes every tile independently,
+# and only it can leave out the tiles of bad quality (skippable): the
+# OME-TIFF has a series for every tile from the beginning.
+
+# This runs inside Fiji (Jython)
+
+from __future__ import absolute_import
+
+import threading
+from os import path
+
+from ij import IJ
+from jarray import array
+from java.io import FileOutputStream
+from loci.formats import FormatTools, MetadataTools
+from loci.formats.out import OMETiffWriter
+from ome.units import UNITS
+from ome.units.quantity import Length
+
+from czi_roisplitter.instrumentation import RunReport
+from czi_roisplitter.raw_tiff import (
+    FLOATING_POINT,
+    SIGNED_INT,
+    UNSIGNED_INT,
+    get_imagej_description,
+    get_imagej_unit,
+    get_tiff_header,
+)
+
+OME_TIFF_TILE_SIZE = 512
+
+
+def get_channel_file_path(output_path, roi_name, channel):
+    return path.join(output_path, roi_name + "_channel-" + str(channel))
+
+
+def get_raw_tiff_header(tile_reader, rect):
+    # header for the pixels of a channel of the region, as read by tile_reader
+    _, _, w, h = tile_reader.clip_rect(rect)
+    if FormatTools.isFloatingPoint(tile_reader.pixel_type):
+        sample_format = FLOATING_POINT
+    elif FormatTools.isSigned(tile_reader.pixel_type):
+        sample_format = SIGNED_INT
+    else:
+        sample_format = UNSIGNED_INT
+    header = get_tiff_header(
+        w,
+        h,
+        tile_reader.bytes_per_pixel,
+        tile_reader.little_endian,
+        sample_format,
+        tile_reader.pixel_size,
+        get_imagej_description(IJ.getVersion(), tile_reader.units),
+    )
+    return array([b - 256 if b > 127 else b for b in bytearray(header)], "b")
+
+
+def write_raw_tiff(file_path, header, pixels):
+    # the pixels go to the file as they were read
+    out = FileOutputStream(file_path)
+    try:
+        out.write(header)
+        out.write(pixels)
+    finally:
+        out.close()
+
+
+def get_roi_id(roi_name):
+    # roi names finish with _squareROI-X
+    return int(roi_name.split("-")[-1])
+
+
+class TifTileWriter(object):
+    resumable = True
+    skippable = True
+
+    def __init__(self, output_path, report=None):
+        self.output_path = output_path
+        if report is None:
+            report = RunReport()
+        self.report = report
+
+    def write_tile(self, tile_reader, index, roi_name, rect):
+        file_paths = []
+        # all the channels have the same header
+        header = get_raw_tiff_header(tile_reader, rect)
+        # for each of the channels
+        for c in range(1, (tile_reader.n_channels + 1)):
+            # read the channel of the high resolution image on that roi
+            pixels = tile_reader.read_bytes(c, rect)
+            # save with coherent name
+            file_path = (
+                get_channel_file_path(self.output_path, roi_name, c) + ".tif"
+            )
+            with self.report.stage("tiff write") as stage:
+                write_raw_tiff(file_path, header, pixels)
+                stage.add_written(path.getsize(file_path))
+            file_paths.append(file_path)
+        return file_paths
+
+    def abort(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class OmeTiffTileWriter(object):
+    """
+    Writes the tiles, in the order of the tiles list, as series of an OME-TIFF.
+    tiles is a list of (roi_name, [x, y, width, height]) in high resolution
+    coordinates, and calibration is (pixel_size, units).
+    """
+
+    resumable = False
+    skippable = False
+
+    def __init__(self, file_path, tiles, calibration, report=None):
+        self.file_path = file_path
+        if report is None:
+            report = RunReport()
+        self.report = report
+        self.index_path = file_path.split(".ome.tif")[0] + "_tiles_index.csv"
+        self.tiles = tiles
+        self.calibration = calibration
+        self.writer = None
+        self.rects = None
+        # series are written in order, the next one to write is this one
+        self.next_index = 0
+        self.condition = threading.Condition()
+        self.aborted = False
+
+    def _setup(self, tile_reader):
+        # the size of every series needs to be known before writing
+        self.rects = [tile_reader.clip_rect(rect) for _, rect in self.tiles]
+        pixel_type = FormatTools.getPixelTypeString(tile_reader.pixel_type)
+        meta = MetadataTools.createOMEXMLMetadata()
+        pixel_size, units = self.calibration
+        for s, (roi_name, _) in enumerate(self.tiles):
+            _, _, w, h = self.rects[s]
+            MetadataTools.populateMetadata(
+                meta,
+                s,
+                roi_name,
+                tile_reader.little_endian,
+                "XYCZT",
+                pixel_type,
+                w,
+                h,
+                1,
+                tile_reader.n_channels,
+                1,
+                1,
+            )
+            if get_imagej_unit(units) == "micron":
+                meta.setPixelsPhysicalSizeX(
+                    Length(pixel_size, UNITS.MICROMETER), s
+                )
+                meta.setPixelsPhysicalSizeY(
+                    Length(pixel_size, UNITS.MICROMETER), s
+                )
+        self.writer = OMETiffWriter()
+        self.writer.setMetadataRetrieve(meta)
+        self.writer.setBigTiff(True)
+        self.writer.setCompression(OMETiffWriter.COMPRESSION_LZW)
+        self.writer.setId(self.file_path)
+
+    def write_tile(self, tile_reader, index, roi_name, rect):
+        # decode outside of the lock, so that other workers can write meanwhile
+        planes = [
+            tile_reader.read_bytes(c, rect)
+            for c in range(1, (tile_reader.n_channels + 1))
+        ]
+        with self.condition:
+            while self.next_index != index and not self.aborted:
+                self.condition.wait()
+            if self.aborted:
+                raise RuntimeError(
+                    "Writing of " + self.file_path + " was aborted"
+                )
+            try:
+                if self.writer is None:
+                    self._setup(tile_reader)
+                self.writer.setSeries(index)
+                # write in chunks, so that parts of a tile can be read later
+                self.writer.setTileSizeX(OME_TIFF_TILE_SIZE)
+                self.writer.setTileSizeY(OME_TIFF_TILE_SIZE)
+                with self.report.stage("ome-tiff write"):
+                    for plane_num, plane in enumerate(planes):
+                        self.writer.saveBytes(plane_num, plane)
+            finally:
+                self.next_index += 1
+                self.condition.notifyAll()
+        # the file is only complete when closed
+        return []
+
+    def abort(self):
+        # stop the workers waiting for a tile that will never be written
+        with self.condition:
+            self.aborted = True
+            self.condition.notifyAll()
+
+    def close(self):
+        if self.writer is None:
+            return
+        with self.report.stage("ome-tiff write") as stage:
+            self.writer.close()
+            # it is compressed, so the size is only known at the end
+            stage.add_written(path.getsize(self.file_path))
+        self.writer = None
+        # index of the tiles in the file
+        pixel_size, units = self.calibration
+        with open(self.index_path, "w") as index_file:
+            index_file.write(
+                "roiID,series,high_res_x_pos,high_res_y_pos,"
+                "width,height,high_res_pixel_size,units\n"
+            )
+            for s, (roi_name, _) in enumerate(self.tiles):
+                x, y, w, h = self.rects[s]
+                index_file.write(
+                    "{},{},{},{},{},{},{},{}\n".format(
+                        get_roi_id(roi_name), s, x, y, w, h, pixel_size, units
+                    )
+                )
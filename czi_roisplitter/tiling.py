@@ -0,0 +1,73 @@
+# Hernando M. Vergara
+# tiling.py calculates which fraction of every square roi (tile) is inside
+# the big roi, so that tiles that are mostly outside can be discarded.
+# The mask of the big roi is read only once, and a summed area table of it
+# gives the number of pixels inside any tile with four lookups.
+
+# This is plain python, it runs both in Fiji (Jython) and in CPython
+
+from __future__ import absolute_import
+
+
+def summed_area_table(mask):
+    """
+    mask is a list of rows that are 0 outside the roi.
+    Returns a table one row and column bigger than the mask, where
+    [y][x] is the number of pixels of the roi above and left of (x, y)
+    """
+    width = len(mask[0]) if len(mask) > 0 else 0
+    table = [[0] * (width + 1)]
+    for row in mask:
+        row_sum = 0
+        previous = table[-1]
+        table_row = [0]
+        for x in range(width):
+            if row[x]:
+                row_sum += 1
+            table_row.append(previous[x + 1] + row_sum)
+        table.append(table_row)
+    return table
+
+
+def _tile_bounds(corner, L, origin, width, height):
+    # pixels of the mask covered by the tile, clipped to the mask
+    x0 = int(round(corner[0] - origin[0]))
+    y0 = int(round(corner[1] - origin[1]))
+    x1 = int(round(corner[0] + L - origin[0]))
+    y1 = int(round(corner[1] + L - origin[1]))
+    area = max(x1 - x0, 1) * max(y1 - y0, 1)
+    return (
+        min(max(x0, 0), width),
+        min(max(y0, 0), height),
+        min(max(x1, 0), width),
+        min(max(y1, 0), height),
+        area,
+    )
+
+
+def tile_coverage(mask, corners, L, origin=(0, 0)):
+    """
+    Fraction of each tile that is inside the roi.
+    corners are the [x, y] top left corners of the tiles, of size L,
+    in the same units as the mask, whose top left pixel is at origin.
+    """
+    table = summed_area_table(mask)
+    height = len(table) - 1
+    width = len(table[0]) - 1
+    bounds = [
+        _tile_bounds(corner, L, origin, width, height) for corner in corners
+    ]
+    coverage = []
+    for x0, y0, x1, y1, area in bounds:
+        inside = table[y1][x1] - table[y0][x1] - table[y1][x0] + table[y0][x0]
+        coverage.append(float(inside) / area)
+    return coverage
+
+
+def filter_corners(corners, coverage, min_coverage):
+    # keeps the order of the corners, so the numbering is still sequential
+    return [
+        corner
+        for corner, fraction in zip(corners, coverage)
+        if fraction >= min_coverage
+    ]
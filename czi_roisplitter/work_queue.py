@@ -0,0 +1,226 @@
+# Hernando M. Vergara
+# work_queue.py is a queue of work units (e.g. a slice and an ARA region of a
+# .czi file) kept as files in a folder on shared storage, so that workers on
+# different computers can process a whole cohort at the same time.
+# Every unit is a json file that moves between the folders pending, claimed,
+# done and failed. A worker claims a unit by renaming (moving) it from pending
+# to claimed: renaming is atomic, so only one worker gets it. While working,
+# the worker touches the file regularly; units claimed by workers that stopped
+# doing it (e.g. their node died) go back to pending. Units that fail are
+# tried again, up to max_attempts times, and then moved to failed.
+
+# This is plain python, it runs both in Fiji (Jython) and in CPython
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from os import path
+
+from czi_roisplitter.atomic_write import replace_file
+
+STATES = ["pending", "claimed", "done", "failed"]
+CONFIG_FILE_NAME = "config.json"
+
+
+def _write_json(file_path, content, tmp_suffix):
+    tmp_path = file_path + "." + tmp_suffix + ".tmp"
+    with open(tmp_path, "w") as json_file:
+        json.dump(content, json_file, indent=1, sort_keys=True)
+    replace_file(tmp_path, file_path)
+
+
+def get_unit_digest(unit):
+    # the same unit gets the same digest, to not add it twice
+    return hashlib.md5(
+        json.dumps(unit, sort_keys=True).encode("utf-8")
+    ).hexdigest()[:12]
+
+
+class WorkQueue(object):
+    def __init__(self, folder, max_attempts=3, stale_after=3600):
+        self.folder = folder
+        self.max_attempts = max_attempts
+        # seconds without news from a worker to consider it dead
+        self.stale_after = stale_after
+
+    def _state_path(self, state, unit_id=None):
+        if unit_id is None:
+            return path.join(self.folder, state)
+        return path.join(self.folder, state, unit_id + ".json")
+
+    def _list(self, state):
+        return sorted(
+            f[: -len(".json")]
+            for f in os.listdir(self._state_path(state))
+            if f.endswith(".json")
+        )
+
+    def create(self, config):
+        # config are the settings shared by all the units, e.g. the size of the
+        # squares. They cannot change once there is a queue, as the units
+        # already there
+        # (and the workers running) would be processed with different settings
+        config_path = path.join(self.folder, CONFIG_FILE_NAME)
+        if path.isfile(config_path):
+            stored = self.read_config()
+            if stored != json.loads(json.dumps(config)):
+                raise ValueError(
+                    "The queue in {} was created with other settings: "
+                    "{}".format(self.folder, stored)
+                )
+            return
+        for state in STATES:
+            if not path.isdir(self._state_path(state)):
+                os.makedirs(self._state_path(state))
+        _write_json(config_path, config, "create")
+
+    def read_config(self):
+        with open(
+            path.join(self.folder, CONFIG_FILE_NAME), "r"
+        ) as config_file:
+            return json.load(config_file)
+
+    def add_units(self, units):
+        # units are dictionaries, processed in this order.
+        # Units already in the queue, in any state, are not added again.
+        # Returns the number of units added
+        known = set(
+            unit_id.split("-")[-1]
+            for state in STATES
+            for unit_id in self._list(state)
+        )
+        n_units = sum(len(self._list(state)) for state in STATES)
+        added = 0
+        for unit in units:
+            digest = get_unit_digest(unit)
+            if digest in known:
+                continue
+            unit_id = "{:06d}-{}".format(n_units + added, digest)
+            _write_json(
+                self._state_path("pending", unit_id),
+                {"id": unit_id, "unit": unit, "attempts": 0, "errors": []},
+                "add",
+            )
+            known.add(digest)
+            added += 1
+        return added
+
+    def claim(self, worker_id):
+        # returns the next pending unit, now belonging to this worker, or None
+        for unit_id in self._list("pending"):
+            claimed_path = self._state_path("claimed", unit_id)
+            try:
+                os.rename(self._state_path("pending", unit_id), claimed_path)
+            except OSError:
+                # another worker got it first
+                continue
+            try:
+                # renaming keeps the time of the file, so a unit that waited
+                # long in pending would look abandoned to the other workers
+                os.utime(claimed_path, None)
+                with open(claimed_path, "r") as unit_file:
+                    entry = json.load(unit_file)
+                entry["worker"] = worker_id
+                entry["claimed_at"] = time.time()
+                _write_json(claimed_path, entry, worker_id)
+            except (IOError, OSError):
+                # given back to the queue meanwhile
+                continue
+            return entry
+        return None
+
+    def heartbeat(self, entry):
+        # tells the others that the unit is still being processed.
+        # Returns False if the unit was given to another worker
+        try:
+            os.utime(self._state_path("claimed", entry["id"]), None)
+        except OSError:
+            return False
+        return True
+
+    @contextmanager
+    def keep_alive(self, entry, interval=None):
+        # sends heartbeats from a thread while the unit is processed
+        if interval is None:
+            interval = self.stale_after / 10.0
+        stop = threading.Event()
+
+        def beat():
+            while not stop.is_set():
+                stop.wait(interval)
+                if not stop.is_set() and not self.heartbeat(entry):
+                    print(
+                        "Unit {} was given to another worker".format(
+                            entry["id"]
+                        )
+                    )
+                    return
+
+        thread = threading.Thread(target=beat)
+        thread.daemon = True
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def _move(self, entry, state):
+        try:
+            os.rename(
+                self._state_path("claimed", entry["id"]),
+                self._state_path(state, entry["id"]),
+            )
+        except OSError:
+            print("Unit {} was given to another worker".format(entry["id"]))
+            return False
+        return True
+
+    def complete(self, entry):
+        return self._move(entry, "done")
+
+    def fail(self, entry, error):
+        # the unit is tried again later, unless it failed too many times
+        entry["attempts"] += 1
+        entry["errors"].append(str(error))
+        claimed_path = self._state_path("claimed", entry["id"])
+        if not path.isfile(claimed_path):
+            print("Unit {} was given to another worker".format(entry["id"]))
+            return False
+        _write_json(claimed_path, entry, entry.get("worker", "worker"))
+        if entry["attempts"] < self.max_attempts:
+            return self._move(entry, "pending")
+        return self._move(entry, "failed")
+
+    def requeue_stale(self):
+        # gives back the units of the workers that stopped sending heartbeats.
+        # Returns their number
+        requeued = 0
+        for unit_id in self._list("claimed"):
+            claimed_path = self._state_path("claimed", unit_id)
+            try:
+                if (
+                    time.time() - path.getmtime(claimed_path)
+                    < self.stale_after
+                ):
+                    continue
+                os.rename(claimed_path, self._state_path("pending", unit_id))
+            except OSError:
+                # finished, or requeued by another worker, meanwhile
+                continue
+            print(
+                "Unit {} was abandoned, it goes back to the queue".format(
+                    unit_id
+                )
+            )
+            requeued += 1
+        return requeued
+
+    def status(self):
+        # number of units in every state
+        return dict((state, len(self._list(state))) for state in STATES)
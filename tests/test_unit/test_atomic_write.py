@@ -0,0 +1,59 @@
+import os
+
+from czi_roisplitter import atomic_write
+from czi_roisplitter.atomic_write import replace_file
+
+
+def write(file_path, text):
+    with open(file_path, "w") as f:
+        f.write(text)
+
+
+def read(file_path):
+    with open(file_path) as f:
+        return f.read()
+
+
+def test_the_file_is_replaced(tmp_path):
+    file_path = str(tmp_path / "index.csv")
+    write(file_path + ".tmp", "new")
+    replace_file(file_path + ".tmp", file_path)
+    assert read(file_path) == "new"
+    write(file_path + ".tmp", "newer")
+    replace_file(file_path + ".tmp", file_path)
+    assert read(file_path) == "newer"
+    assert os.listdir(str(tmp_path)) == ["index.csv"]
+
+
+def test_the_file_is_never_removed_when_it_can_be_renamed_over(
+    tmp_path, monkeypatch
+):
+    file_path = str(tmp_path / "index.csv")
+    write(file_path, "old")
+    write(file_path + ".tmp", "new")
+
+    def no_remove(_):
+        raise AssertionError("the file was removed before the rename")
+
+    monkeypatch.setattr(atomic_write.os, "remove", no_remove)
+    replace_file(file_path + ".tmp", file_path)
+    assert read(file_path) == "new"
+
+
+def test_the_file_is_removed_first_where_rename_does_not_replace(
+    tmp_path, monkeypatch
+):
+    # as on Windows
+    file_path = str(tmp_path / "index.csv")
+    write(file_path, "old")
+    write(file_path + ".tmp", "new")
+    rename = os.rename
+
+    def windows_rename(source, target):
+        if os.path.exists(target):
+            raise OSError("the file exists")
+        rename(source, target)
+
+    monkeypatch.setattr(atomic_write.os, "rename", windows_rename)
+    replace_file(file_path + ".tmp", file_path)
+    assert read(file_path) == "new"
@@ -0,0 +1,35 @@
+import pytest
+
+from czi_roisplitter.downsampling import (
+    get_downsampled_size,
+    get_downsampling_strips,
+)
+
+
+def test_downsampling_strips_cover_every_row():
+    strips = get_downsampling_strips(1000, 97, 100)
+    assert strips[0][0] == 0 and strips[0][2] == 0
+    assert strips[-1][1] == 1000 and strips[-1][3] == 97
+    for (_, y1, _, new_y1), (y0, _, new_y0, _) in zip(strips, strips[1:]):
+        assert new_y0 == new_y1
+        assert y0 <= y1
+    assert all(y1 - y0 <= 100 + 11 for y0, y1, _, _ in strips)
+
+
+def test_downsampling_strips_with_few_rows():
+    assert get_downsampling_strips(10, 5, 1) == [
+        (0, 2, 0, 1),
+        (2, 4, 1, 2),
+        (4, 6, 2, 3),
+        (6, 8, 3, 4),
+        (8, 10, 4, 5),
+    ]
+
+
+def test_too_coarse_downsampling_is_an_error():
+    assert get_downsampled_size(1000, 500, 0.1) == (100, 50)
+    # e.g. a coarse final resolution on a small piramid
+    with pytest.raises(ValueError):
+        get_downsampled_size(1000, 5, 0.1)
+    with pytest.raises(ValueError):
+        get_downsampling_strips(10, 0, 1)
@@ -0,0 +1,78 @@
+import json
+import threading
+
+from czi_roisplitter.instrumentation import RunReport
+
+
+class FakeProbe:
+    def __init__(self):
+        self.resets = 0
+        self.value = 100
+
+    def reset(self):
+        self.resets += 1
+
+    def peak(self):
+        self.value += 10
+        return self.value
+
+
+def test_stages_accumulate_from_several_threads(tmp_path):
+    report = RunReport()
+
+    def write_tiles():
+        for _ in range(50):
+            with report.stage("tiff write") as stage:
+                stage.add_written(1000)
+
+    threads = [threading.Thread(target=write_tiles) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with report.stage("summary") as stage:
+        stage.add_read(5)
+    report.add_tile("sq-1", 0.5, 10, 20)
+
+    report_path = str(tmp_path / "report.json")
+    report.save(report_path)
+    with open(report_path) as report_file:
+        saved = json.load(report_file)
+    assert [s["name"] for s in saved["stages"]] == ["tiff write", "summary"]
+    assert saved["stages"][0]["calls"] == 200
+    assert saved["stages"][0]["bytes_written"] == 200000
+    assert saved["stages"][1]["bytes_read"] == 5
+    assert saved["stages"][0]["peak_memory"] is None
+    assert saved["tiles"] == [
+        {
+            "roi_name": "sq-1",
+            "seconds": 0.5,
+            "bytes_read": 10,
+            "bytes_written": 20,
+        }
+    ]
+    assert "tiff write: " in report.summary()
+
+
+def test_peak_memory_is_the_maximum_of_the_calls():
+    probe = FakeProbe()
+    report = RunReport(memory_probe=probe)
+    with report.stage("series open", reset_memory=True):
+        pass
+    with report.stage("series open", reset_memory=True):
+        pass
+    assert probe.resets == 2
+    assert report.to_dict()["stages"][0]["peak_memory"] == 120
+
+
+def test_peak_memory_only_of_stages_that_reset_it():
+    probe = FakeProbe()
+    report = RunReport(memory_probe=probe)
+    with report.stage("tiles export", reset_memory=True):
+        with report.stage("tiff write"):
+            pass
+    # the peak of the export is not the one of the tiff write
+    stages = report.to_dict()["stages"]
+    assert [s["name"] for s in stages] == ["tiff write", "tiles export"]
+    assert stages[0]["peak_memory"] is None
+    assert stages[1]["peak_memory"] == 110
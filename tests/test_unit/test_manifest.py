@@ -0,0 +1,48 @@
+from czi_roisplitter.manifest import TileManifest, get_manifest_path
+
+RECT = [0, 0, 768, 768]
+
+
+def write_tile(tmp_path, name, content=b"pixels"):
+    file_path = str(tmp_path / (name + ".tif"))
+    with open(file_path, "wb") as tile_file:
+        tile_file.write(content)
+    return file_path
+
+
+def test_done_tiles_are_skipped_after_reload(tmp_path):
+    manifest_path = get_manifest_path(str(tmp_path), "slice-0_manualROI-R")
+    manifest = TileManifest(manifest_path)
+    tiles = [("sq-1", RECT), ("sq-2", [768, 0, 768, 768])]
+    manifest.mark_done("sq-1", RECT, [write_tile(tmp_path, "sq-1")])
+
+    reloaded = TileManifest(manifest_path)
+    assert reloaded.is_done("sq-1", RECT)
+    assert reloaded.get_pending(tiles) == [tiles[1]]
+
+
+def test_moved_or_changed_tiles_are_not_done(tmp_path):
+    manifest = TileManifest(str(tmp_path / "m.jsonl"))
+    file_path = write_tile(tmp_path, "sq-1")
+    manifest.mark_done("sq-1", RECT, [file_path])
+    assert not manifest.is_done("sq-1", [0, 0, 512, 512])
+    write_tile(tmp_path, "sq-1", b"truncated and different")
+    assert not manifest.is_done("sq-1", RECT)
+    manifest.mark_done("sq-2", RECT, [])
+    assert not manifest.is_done("sq-2", RECT)
+
+
+def test_unfinished_line_is_ignored(tmp_path):
+    manifest_path = str(tmp_path / "m.jsonl")
+    manifest = TileManifest(manifest_path)
+    manifest.mark_done("sq-1", RECT, [write_tile(tmp_path, "sq-1")])
+    with open(manifest_path, "a") as manifest_file:
+        manifest_file.write('{"roi_name": "sq-2", "re')
+
+    reloaded = TileManifest(manifest_path)
+    assert reloaded.is_done("sq-1", RECT)
+    reloaded.mark_done("sq-3", RECT, [write_tile(tmp_path, "sq-3")])
+    assert TileManifest(manifest_path).is_done("sq-3", RECT)
+
+    reloaded.reset()
+    assert not TileManifest(manifest_path).is_done("sq-1", RECT)
@@ -0,0 +1,49 @@
+import os
+
+from czi_roisplitter import metadata_cache
+from czi_roisplitter.file_lock import FileLock
+from czi_roisplitter.metadata_cache import (
+    get_cache_path,
+    load_cache,
+    save_cache,
+)
+
+
+def make_czi(tmp_path):
+    input_path = str(tmp_path / "mouse_slide-1.czi")
+    with open(input_path, "wb") as czi_file:
+        czi_file.write(b"\0" * 16)
+    return input_path
+
+
+def test_cache_round_trip(tmp_path):
+    input_path = make_czi(tmp_path)
+    assert load_cache(input_path) is None
+    data = {"num_of_piramids_list": [7, 6], "calibration": {}}
+    assert save_cache(input_path, data)
+    assert load_cache(input_path) == data
+
+
+def test_cache_invalidated_when_file_changes(tmp_path):
+    input_path = make_czi(tmp_path)
+    save_cache(input_path, {"number_of_images": 2})
+    with open(input_path, "ab") as czi_file:
+        czi_file.write(b"\0")
+    assert load_cache(input_path) is None
+
+
+def test_corrupt_cache_is_ignored(tmp_path):
+    input_path = make_czi(tmp_path)
+    with open(get_cache_path(input_path), "w") as cache_file:
+        cache_file.write("{not json")
+    assert load_cache(input_path) is None
+    assert save_cache(input_path, {"number_of_images": 1})
+    assert not os.path.exists(get_cache_path(input_path) + ".tmp")
+
+
+def test_locked_cache_is_not_written(tmp_path, monkeypatch):
+    input_path = make_czi(tmp_path)
+    monkeypatch.setattr(metadata_cache, "CACHE_LOCK_TIMEOUT", 0.2)
+    with FileLock(get_cache_path(input_path)):
+        assert not save_cache(input_path, {"number_of_images": 1})
+    assert load_cache(input_path) is None
@@ -0,0 +1,131 @@
+import pytest
+
+from czi_roisplitter.planning import (
+    choose_focus_piramid,
+    get_focus_rect,
+    get_hemisphere,
+    get_hemisphere_rect,
+    get_manualROI_name,
+    get_output_path,
+    get_region_name,
+    get_registration_folder_name,
+    get_square_side,
+    parse_ARA_regions,
+    parse_registration_info,
+    parse_rois_to_remove,
+    plan_shared_reads,
+    plan_tiles,
+)
+
+
+def test_plan_tiles_scales_corners_to_high_resolution():
+    L = get_square_side("6", 32)
+    assert L == 24
+    tiles, positions = plan_tiles(
+        [[10, 20], [34, 20]], L, 32, "s_slice-0_manualROI-R"
+    )
+    assert tiles == [
+        ("s_slice-0_manualROI-R_squareROI-1", [320, 640, 768, 768]),
+        ("s_slice-0_manualROI-R_squareROI-2", [1088, 640, 768, 768]),
+    ]
+    assert positions == [[1, 320, 640, 768], [2, 1088, 640, 768]]
+
+
+def test_focus_rect_is_the_bounding_box_in_the_focus_piramid():
+    corners = [[10, 20], [34, 20], [10, 44]]
+    # binFactor of the low resolution is 32, the 2nd piramid is binned 2
+    assert get_focus_rect(corners, 24, 32, 2, 2) == [160, 320, 768, 768]
+
+
+def test_naming():
+    assert get_manualROI_name("a_slice-1", "R") == "a_slice-1_manualROI-R"
+    assert (
+        get_manualROI_name("a_slice-1", "R", "Both-Caudoputamen")
+        == "a_slice-1_manualROI-Both-Caudoputamen"
+    )
+    assert (
+        get_output_path("/exp/Raw/a.czi", "BRAC1_group_slide-2").replace(
+            "\\", "/"
+        )
+        == "/exp/Processed_data/BRAC1/ROIs"
+    )
+    assert (
+        get_registration_folder_name(1, 25.0)
+        == "Slices_for_ARA_registration_channel-1_25.0-umpx"
+    )
+
+
+def test_parsing():
+    assert parse_registration_info("") is None
+    assert parse_registration_info("6, 4, 22.619") == (6, 4, 22.619)
+    assert parse_rois_to_remove("1, 5,7") == [1, 5, 7]
+    assert parse_rois_to_remove("3-6") == [3, 4, 5, 6]
+    assert parse_rois_to_remove("2") == [2]
+    with pytest.raises(ValueError):
+        parse_rois_to_remove("two")
+
+
+def test_overlapping_tiles_of_different_regions_are_read_together():
+    region_a = [("a-1", [0, 0, 10, 10]), ("a-2", [10, 0, 10, 10])]
+    # b-1 is a-1 shifted by 2 pixels, b-2 is far from everything
+    region_b = [("b-1", [2, 0, 10, 10]), ("b-2", [100, 100, 10, 10])]
+    groups, ordered_tiles = plan_shared_reads([region_a, region_b])
+    assert groups == [
+        (
+            [0, 0, 12, 10],
+            [(0, 0, "a-1", [0, 0, 10, 10]), (1, 0, "b-1", [2, 0, 10, 10])],
+        ),
+        ([10, 0, 10, 10], [(0, 1, "a-2", [10, 0, 10, 10])]),
+        ([100, 100, 10, 10], [(1, 1, "b-2", [100, 100, 10, 10])]),
+    ]
+    assert ordered_tiles == [region_a, region_b]
+
+
+def test_shared_reads_never_read_more_than_the_tiles():
+    # b-1 overlaps a-1 by a corner only, its union is bigger than both
+    groups, ordered_tiles = plan_shared_reads(
+        [[("a-1", [0, 0, 10, 10])], [("b-1", [9, 9, 10, 10])]]
+    )
+    assert [rect for rect, _ in groups] == [[0, 0, 10, 10], [9, 9, 10, 10]]
+    # tiles are numbered in the order they are read
+    groups, ordered_tiles = plan_shared_reads(
+        [
+            [("a-1", [50, 0, 10, 10]), ("a-2", [0, 0, 10, 10])],
+            [("b-1", [0, 0, 10, 10]), ("b-2", [50, 0, 10, 10])],
+        ]
+    )
+    assert [name for name, _ in ordered_tiles[1]] == ["b-2", "b-1"]
+    assert groups[0][1][1] == (1, 0, "b-2", [50, 0, 10, 10])
+
+
+def test_parse_ARA_regions():
+    assert parse_ARA_regions("Both-Caudoputamen, Left-Amygdala,") == [
+        "Both-Caudoputamen",
+        "Left-Amygdala",
+    ]
+
+
+def test_ARA_regions_keep_their_hemisphere():
+    assert get_region_name("Left-Caudoputamen") == "Caudoputamen"
+    assert get_hemisphere("Left-Caudoputamen") == "Left"
+    assert get_hemisphere("Right-Caudoputamen") == "Right"
+    assert get_hemisphere_rect("Both", 101, 50) is None
+    left = get_hemisphere_rect("Left", 101, 50)
+    right = get_hemisphere_rect("Right", 101, 50)
+    assert left == [0, 0, 50, 50] and right == [50, 0, 51, 50]
+
+
+@pytest.mark.parametrize("ARA_region", ["Caudoputamen", "Top-Caudoputamen"])
+def test_ARA_regions_without_hemisphere_are_an_error(ARA_region):
+    with pytest.raises(ValueError):
+        get_hemisphere(ARA_region)
+
+
+def test_focus_piramid_is_the_coarsest_big_enough():
+    # 8000 pixels in the highest resolution: 4000, 2000, 1000, 500 in the next
+    # ones
+    assert choose_focus_piramid(8000, 5, 2, 1500) == 3
+    assert choose_focus_piramid(8000, 5, 2, 2000) == 3
+    assert choose_focus_piramid(8000, 5, 2, 100) == 5
+    # too small even in the highest resolution
+    assert choose_focus_piramid(800, 5, 2, 1500) == 1
@@ -0,0 +1,34 @@
+from czi_roisplitter.positions import (
+    get_index_path,
+    read_positions_index,
+    update_positions_index,
+    write_positions_file,
+)
+
+
+def test_positions_file_format(tmp_path):
+    file_path = str(tmp_path / "slice-0_manualROI-R_roi_positions.txt")
+    write_positions_file(file_path, [[1, 768, 0, 0, 0.345, "micron"]])
+    with open(file_path) as positions_file:
+        assert positions_file.read() == (
+            "roiID, high_res_x_pos, high_res_y_pos, "
+            "registration_image_pixel_size, high_res_pixel_size, units\n"
+            "1, 768, 0, 0, 0.345, micron"
+        )
+
+
+def test_index_replaces_rows_of_the_same_roi(tmp_path):
+    index_path = get_index_path(str(tmp_path))
+    assert read_positions_index(index_path) == []
+    row = [1, 0, 0, 768, 22.6, 0.345, "micron"]
+    update_positions_index(index_path, "slice-0_manualROI-R", [row, row])
+    update_positions_index(index_path, "slice-1_manualROI-R", [row])
+    update_positions_index(index_path, "slice-0_manualROI-R", [row])
+
+    entries = read_positions_index(index_path)
+    assert [e["manualROI_name"] for e in entries] == [
+        "slice-1_manualROI-R",
+        "slice-0_manualROI-R",
+    ]
+    assert entries[0]["size"] == "768"
+    assert entries[0]["units"] == "micron"
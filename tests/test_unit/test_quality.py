@@ -0,0 +1,62 @@
+from czi_roisplitter.quality import (
+    get_histogram_fractions,
+    get_quality_path,
+    get_saturation_value,
+    get_skipped_ids,
+    is_usable,
+    parse_quality_thresholds,
+    read_quality_file,
+    update_quality_file,
+)
+
+
+def test_histogram_fractions():
+    histogram = [0] * 256
+    histogram[10] = 50  # background
+    histogram[100] = 40  # tissue
+    histogram[255] = 10  # saturated tissue
+    saturated, tissue = get_histogram_fractions(histogram, 50.0, 255)
+    assert saturated == 0.1
+    assert tissue == 0.5
+    assert get_histogram_fractions([0] * 256, 50, 255) == (0.0, 0.0)
+
+
+def test_saturation_of_12_bit_data_in_16_bit_images():
+    histogram = [0] * 65536
+    histogram[300] = 75
+    histogram[4095] = 25  # saturated in a 12 bit file
+    saturated, _ = get_histogram_fractions(
+        histogram, 100, get_saturation_value(12, 16)
+    )
+    assert saturated == 0.25
+    # without the bits of the file, the maximum of the image type
+    assert get_saturation_value(None, 16) == 65535
+    assert get_saturation_value(16, 8) == 255
+
+
+def test_thresholds():
+    assert parse_quality_thresholds(" ") is None
+    thresholds = parse_quality_thresholds("100, 0.05, 0.2")
+    metrics = {
+        "focus": 150.0,
+        "saturated_fraction": 0.01,
+        "tissue_fraction": 0.5,
+    }
+    assert is_usable(metrics, None)
+    assert is_usable(metrics, thresholds)
+    assert not is_usable(dict(metrics, tissue_fraction=0.1), thresholds)
+    assert not is_usable(dict(metrics, focus=20.0), thresholds)
+
+
+def test_quality_file_keeps_the_tiles_measured_before(tmp_path):
+    file_path = get_quality_path(str(tmp_path), "slice-0_manualROI-R")
+    update_quality_file(
+        file_path, [[2, 10.5, 0.0, 0.1, 0], [1, 90.0, 0.0, 0.8, 1]]
+    )
+    assert get_skipped_ids(file_path) == {2}
+    # tile 2 is measured again in a later run, and exported
+    update_quality_file(file_path, [[2, 10.5, 0.0, 0.1, 1]])
+    entries = read_quality_file(file_path)
+    assert [e["roiID"] for e in entries] == ["1", "2"]
+    assert entries[0]["tissue_fraction"] == "0.8"
+    assert get_skipped_ids(file_path) == set()
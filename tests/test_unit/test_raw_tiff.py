@@ -0,0 +1,70 @@
+import struct
+
+import numpy as np
+import pytest
+
+from czi_roisplitter.raw_tiff import get_imagej_description, get_tiff_header
+
+
+def read_tags(data):
+    order = "<" if data[:2] == b"II" else ">"
+    magic, ifd_offset = struct.unpack(order + "HI", data[2:8])
+    assert magic == 42
+    (n_entries,) = struct.unpack_from(order + "H", data, ifd_offset)
+    tags = {}
+    for i in range(n_entries):
+        start = ifd_offset + 2 + 12 * i
+        tag, tag_type, count = struct.unpack_from(order + "HHI", data, start)
+        if tag_type == 3:
+            (value,) = struct.unpack_from(order + "H", data, start + 8)
+        else:
+            (value,) = struct.unpack_from(order + "I", data, start + 8)
+        if tag_type == 2:
+            value = data[value:][: count - 1].decode("ascii")
+        elif tag_type == 5:
+            value = struct.unpack_from(order + "II", data, value)
+        tags[tag] = value
+    return order, tags
+
+
+@pytest.mark.parametrize("little_endian", [True, False])
+def test_pixels_follow_the_header(tmp_path, little_endian):
+    dtype = np.dtype("<u2" if little_endian else ">u2")
+    pixels = np.arange(6 * 4, dtype=dtype).reshape(4, 6)
+    header = get_tiff_header(
+        6,
+        4,
+        2,
+        little_endian,
+        pixel_size=0.5,
+        description=get_imagej_description("1.54f", "micron"),
+    )
+    file_path = tmp_path / "tile.tif"
+    file_path.write_bytes(header + pixels.tobytes())
+
+    data = file_path.read_bytes()
+    order, tags = read_tags(data)
+    assert order == ("<" if little_endian else ">")
+    assert (tags[256], tags[257], tags[258], tags[339]) == (6, 4, 16, 1)
+    assert tags[270] == "ImageJ=1.54f\nunit=micron\n"
+    assert tags[282][0] / tags[282][1] == 2.0
+    assert tags[279] == pixels.nbytes
+    read = np.frombuffer(data, dtype=dtype, count=6 * 4, offset=tags[273])
+    assert (read.reshape(4, 6) == pixels).all()
+
+
+def test_header_without_calibration():
+    header = get_tiff_header(3, 3, 1, True)
+    _, tags = read_tags(header)
+    assert 282 not in tags and 270 not in tags
+    assert tags[273] == len(header)
+
+
+@pytest.mark.parametrize("unit", ["µm", "μm", "um", "Microns"])
+def test_micrometers_are_written_as_micron(unit):
+    description = get_imagej_description("1.54f", unit)
+    assert description == "ImageJ=1.54f\nunit=micron\n"
+    _, tags = read_tags(
+        get_tiff_header(3, 3, 1, True, description=description)
+    )
+    assert tags[270] == description
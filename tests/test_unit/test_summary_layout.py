@@ -0,0 +1,68 @@
+from czi_roisplitter.summary_layout import (
+    MAX_LABEL_SIZE,
+    MIN_LABEL_SIZE,
+    get_cell_name,
+    get_contact_sheet_cells,
+    get_contact_sheet_layout,
+    get_crop_rect,
+    get_label_size,
+    get_summary_scale,
+    scale_square,
+)
+
+
+def test_summary_is_never_upscaled():
+    assert get_summary_scale(1000, 500, 2048) == 1.0
+    assert get_summary_scale(4096, 1024, 2048) == 0.5
+
+
+def test_squares_scaled_and_moved_to_the_buffer():
+    assert scale_square([100, 40], 50, 0.5) == [50, 20, 25]
+    assert scale_square([100, 40], 50, 0.5, x0=10, y0=20) == [40, 0, 25]
+    # tiny squares are still drawn
+    assert scale_square([0, 0], 1, 0.1)[2] == 1
+    assert get_label_size(6) == MIN_LABEL_SIZE
+    assert get_label_size(1000) == MAX_LABEL_SIZE
+
+
+def test_crop_is_square_and_inside_the_image():
+    assert get_crop_rect([40, 40, 20, 10], 200, 100, margin=0.5) == [
+        30,
+        25,
+        40,
+        40,
+    ]
+    # moved inside at the borders, and never bigger than the image
+    assert get_crop_rect([0, 90, 20, 10], 200, 100, margin=0.5) == [
+        0,
+        60,
+        40,
+        40,
+    ]
+    assert get_crop_rect([0, 0, 300, 50], 200, 100) == [100, 0, 100, 100]
+
+
+def test_contact_sheet_layout():
+    width, height, positions = get_contact_sheet_layout(
+        7, cell_size=10, columns=3
+    )
+    assert (width, height) == (30, 30)
+    assert positions[:4] == [[0, 0], [10, 0], [20, 0], [0, 10]]
+    assert get_contact_sheet_layout(2, cell_size=10, columns=3)[:2] == (20, 10)
+
+
+def test_contact_sheet_cells_of_a_slide_by_slice():
+    names = [
+        "m1_slide-1_slice-10_manualROI-Both-CP",
+        "m1_slide-1_slice-2_manualROI-R",
+        "m1_slide-1_slice-2_manualROI-L",
+        "m1_slide-2_slice-0_manualROI-R",
+    ]
+    files = [get_cell_name(n) for n in names] + [
+        "m1_slide-1_slice-2_manualROI-R_summaryImage.tif"
+    ]
+    assert get_contact_sheet_cells(files, "m1_slide-1") == [
+        names[2],
+        names[1],
+        names[0],
+    ]
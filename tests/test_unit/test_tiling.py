@@ -0,0 +1,28 @@
+import pytest
+
+from czi_roisplitter.tiling import filter_corners, tile_coverage
+
+# a 4 x 6 roi whose left half is inside
+MASK = [[1, 1, 1, 0, 0, 0] for _ in range(4)]
+CORNERS = [[0, 0], [2, 0], [4, 0], [10, 10], [-1, 2]]
+EXPECTED = [1.0, 0.5, 0.0, 0.0, 0.5]
+
+
+def test_tile_coverage():
+    assert tile_coverage(MASK, CORNERS, 2) == pytest.approx(EXPECTED)
+
+
+def test_tile_coverage_with_origin():
+    corners = [[x + 100, y + 50] for x, y in CORNERS]
+    coverage = tile_coverage(MASK, corners, 2, origin=(100, 50))
+    assert coverage == pytest.approx(EXPECTED)
+
+
+def test_tile_coverage_no_corners():
+    assert tile_coverage(MASK, [], 2) == []
+
+
+def test_filter_corners_keeps_order():
+    kept = filter_corners(CORNERS, EXPECTED, 0.5)
+    assert kept == [[0, 0], [2, 0], [-1, 2]]
+    assert filter_corners(CORNERS, EXPECTED, 0) == CORNERS
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+
+import pytest
+
+from czi_roisplitter import work_queue
+from czi_roisplitter.file_lock import FileLock, read_owner
+from czi_roisplitter.positions import (
+    get_index_path,
+    read_positions_index,
+    update_positions_index,
+)
+from czi_roisplitter.work_queue import WorkQueue
+
+
+def make_queue(tmp_path, n_units, **kwargs):
+    # a local folder stands in for the shared storage
+    queue = WorkQueue(str(tmp_path / "queue"), **kwargs)
+    queue.create({"tile_size": 6})
+    units = [
+        {
+            "input_path": "a.czi",
+            "slice": "a_slice-{}".format(i),
+            "region": "Both-CP",
+        }
+        for i in range(n_units)
+    ]
+    assert queue.add_units(units) == n_units
+    return queue, units
+
+
+def test_units_are_added_once_and_in_order(tmp_path):
+    queue, units = make_queue(tmp_path, 3)
+    assert queue.read_config() == {"tile_size": 6}
+    assert queue.add_units(units + [{"input_path": "b.czi"}]) == 1
+    assert queue.status() == {
+        "pending": 4,
+        "claimed": 0,
+        "done": 0,
+        "failed": 0,
+    }
+    assert queue.claim("w")["unit"] == units[0]
+
+
+def test_settings_of_a_queue_cannot_change(tmp_path):
+    queue, _ = make_queue(tmp_path, 1)
+    queue.create({"tile_size": 6})
+    with pytest.raises(ValueError):
+        queue.create({"tile_size": 8})
+    assert queue.read_config() == {"tile_size": 6}
+
+
+def test_every_unit_is_claimed_by_one_worker(tmp_path):
+    queue, _ = make_queue(tmp_path, 40)
+    claimed = {}
+
+    def worker(worker_id):
+        while True:
+            entry = queue.claim(worker_id)
+            if entry is None:
+                return
+            claimed.setdefault(entry["id"], []).append(worker_id)
+            assert queue.complete(entry)
+
+    threads = [
+        threading.Thread(target=worker, args=("w{}".format(i),))
+        for i in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(claimed) == 40
+    assert all(len(workers) == 1 for workers in claimed.values())
+    assert queue.status() == {
+        "pending": 0,
+        "claimed": 0,
+        "done": 40,
+        "failed": 0,
+    }
+
+
+def test_failed_units_are_retried(tmp_path):
+    queue, _ = make_queue(tmp_path, 1, max_attempts=2)
+    entry = queue.claim("w")
+    assert queue.fail(entry, ValueError("no ROI"))
+    assert queue.status()["pending"] == 1
+    entry = queue.claim("w")
+    assert entry["errors"] == ["no ROI"]
+    queue.fail(entry, "no ROI")
+    assert queue.status() == {
+        "pending": 0,
+        "claimed": 0,
+        "done": 0,
+        "failed": 1,
+    }
+    assert queue.claim("w") is None
+
+
+def test_abandoned_units_go_back_to_the_queue(tmp_path):
+    queue, _ = make_queue(tmp_path, 2, stale_after=60)
+    dead = queue.claim("dead")
+    alive = queue.claim("alive")
+    old = time.time() - 120
+    os.utime(
+        os.path.join(queue.folder, "claimed", dead["id"] + ".json"), (old, old)
+    )
+    assert queue.requeue_stale() == 1
+    other = queue.claim("other")
+    assert other["id"] == dead["id"]
+    assert queue.heartbeat(alive)
+    assert queue.complete(alive)
+    assert not queue.heartbeat(alive)
+    assert queue.complete(other)
+    # a worker cannot complete a unit taken over by another one
+    assert not queue.complete(dead)
+
+
+def test_units_that_waited_long_are_not_abandoned_when_claimed(
+    tmp_path, monkeypatch
+):
+    queue, _ = make_queue(tmp_path, 1, stale_after=60)
+    pending_path = os.path.join(
+        queue.folder, "pending", queue._list("pending")[0] + ".json"
+    )
+    old = time.time() - 7200
+    os.utime(pending_path, (old, old))
+    # another worker looks for abandoned units while this one reads the claimed
+    # unit
+    requeued = []
+    load = work_queue.json.load
+
+    def load_while_requeueing(json_file):
+        requeued.append(queue.requeue_stale())
+        return load(json_file)
+
+    monkeypatch.setattr(work_queue.json, "load", load_while_requeueing)
+    entry = queue.claim("w")
+    assert requeued == [0]
+    assert queue.status() == {
+        "pending": 0,
+        "claimed": 1,
+        "done": 0,
+        "failed": 0,
+    }
+    assert queue.complete(entry)
+
+
+def test_lock_is_exclusive(tmp_path):
+    index_path = get_index_path(str(tmp_path))
+    row = [1, 0, 0, 768, 22.6, 0.345, "micron"]
+    threads = [
+        threading.Thread(
+            target=update_positions_index,
+            args=(index_path, "slice-{}_manualROI-R".format(i), [row]),
+        )
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(read_positions_index(index_path)) == 8
+    assert not os.path.exists(index_path + ".lock")
+
+
+def test_stale_lock_is_removed(tmp_path):
+    file_path = str(tmp_path / "index.csv")
+    os.mkdir(file_path + ".lock")
+    with pytest.raises(RuntimeError):
+        FileLock(file_path, timeout=0.2, poll=0.05).acquire()
+    old = time.time() - 120
+    os.utime(file_path + ".lock", (old, old))
+    with FileLock(file_path, timeout=1, stale_after=60):
+        assert os.path.isdir(file_path + ".lock")
+    assert not os.path.exists(file_path + ".lock")
+
+
+def test_lock_is_only_released_by_its_owner(tmp_path):
+    file_path = str(tmp_path / "index.csv")
+    lock = FileLock(file_path, stale_after=60)
+    lock.acquire()
+    # taken as abandoned by another process, which now holds it
+    os.rename(lock.lock_path, lock.lock_path + ".old")
+    other = FileLock(file_path, stale_after=60)
+    other.acquire()
+    lock.release()
+    assert read_owner(other.lock_path) == other.token
+    other.release()
+    assert not os.path.exists(other.lock_path)
+
+
+def test_held_lock_is_refreshed(tmp_path):
+    file_path = str(tmp_path / "slice.tif")
+    with FileLock(file_path, stale_after=0.4) as lock:
+        old = time.time() - 120
+        os.utime(lock.lock_path, (old, old))
+        time.sleep(0.3)
+        # a waiter does not break it
+        FileLock(file_path, stale_after=0.4)._break_if_stale()
+        assert read_owner(lock.lock_path) == lock.token